@@ -9,23 +9,31 @@ from typing import Any, Dict, List
 from urllib.parse import quote_plus
 
 import coloredlogs  # type: ignore[import]
+from motor.motor_tornado import MotorClient  # type: ignore
 
 # local imports
 from rest_tools.server import RestHandlerSetup, RestServer  # type: ignore
 from wipac_dev_tools import from_environment  # type: ignore[import]
 
 from . import config
-from .data_sources import table_config_cache, todays_institutions
+from .data_sources import mou_db, table_config_cache, todays_institutions
 from .routes import (
+    SNAPSHOT_RESPONSE_CACHE_SIZE,
     InstitutionStaticHandler,
+    InstitutionValuesAllHandler,
     InstitutionValuesHandler,
     MainHandler,
     MakeSnapshotHandler,
+    MongoPoolMetricsHandler,
     RecordHandler,
+    RecordsHandler,
     SnapshotsHandler,
     TableConfigHandler,
     TableHandler,
+    TableHistoryHandler,
+    TableTotalsHandler,
 )
+from .utils import mongo_tools, utils
 
 
 async def start(debug: bool = False) -> RestServer:
@@ -51,22 +59,49 @@ async def start(debug: bool = False) -> RestServer:
     mongodb_url = f"mongodb://{mongodb_host}:{mongodb_port}"
     if mongodb_auth_user and mongodb_auth_pass:
         mongodb_url = f"mongodb://{mongodb_auth_user}:{mongodb_auth_pass}@{mongodb_host}:{mongodb_port}"
-    args["mongodb_url"] = mongodb_url
+
+    # Setup DB client -- app-scoped, so all requests share one connection pool
+    args["pool_metrics"] = mongo_tools.ConnectionPoolMetrics()
+    motor_client = MotorClient(
+        mongodb_url,
+        maxPoolSize=int(config_env["MOU_MONGODB_MAX_POOL_SIZE"]),
+        minPoolSize=int(config_env["MOU_MONGODB_MIN_POOL_SIZE"]),
+        event_listeners=[args["pool_metrics"]],
+    )
+    args["mou_db_client"] = mou_db.MoUDatabaseClient(
+        motor_client,
+        utils.MoUDataAdaptor(args["tc_cache"]),
+        delta_snapshots=config_env["MOU_SNAPSHOT_MODE"] == "delta",
+    )
+    await args["mou_db_client"].ensure_all_db_indexes()  # one-time, not per-request
+    await args["mou_db_client"].backfill_snapshot_catalogs()  # one-time migration
+
+    # Snapshots are immutable, so their (serialized) responses are app-scoped
+    args["snapshot_responses"] = utils.LRUCache(SNAPSHOT_RESPONSE_CACHE_SIZE)
 
     # Configure REST Routes
     server = RestServer(debug=debug)
     server.add_route(MainHandler.ROUTE, MainHandler, args)  # get
     server.add_route(TableHandler.ROUTE, TableHandler, args)  # get, post
+    server.add_route(TableTotalsHandler.ROUTE, TableTotalsHandler, args)  # get
+    server.add_route(TableHistoryHandler.ROUTE, TableHistoryHandler, args)  # get
     server.add_route(SnapshotsHandler.ROUTE, SnapshotsHandler, args)  # get
     server.add_route(MakeSnapshotHandler.ROUTE, MakeSnapshotHandler, args)  # post
     server.add_route(RecordHandler.ROUTE, RecordHandler, args)  # post, delete
+    server.add_route(RecordsHandler.ROUTE, RecordsHandler, args)  # post
     server.add_route(TableConfigHandler.ROUTE, TableConfigHandler, args)  # get
     server.add_route(  # get, post
         InstitutionValuesHandler.ROUTE, InstitutionValuesHandler, args
     )
+    server.add_route(  # get
+        InstitutionValuesAllHandler.ROUTE, InstitutionValuesAllHandler, args
+    )
     server.add_route(  # get
         InstitutionStaticHandler.ROUTE, InstitutionStaticHandler, args
     )
+    server.add_route(  # get
+        MongoPoolMetricsHandler.ROUTE, MongoPoolMetricsHandler, args
+    )
 
     server.startup(
         address=config_env["MOU_REST_HOST"], port=int(config_env["MOU_REST_PORT"])
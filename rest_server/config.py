@@ -16,8 +16,11 @@ DEFAULT_ENV_CONFIG = {
     "MOU_MONGODB_AUTH_PASS": "",  # empty means no authentication required
     "MOU_MONGODB_HOST": "localhost",
     "MOU_MONGODB_PORT": "27017",
+    "MOU_MONGODB_MAX_POOL_SIZE": "100",  # max connections in the shared client's pool
+    "MOU_MONGODB_MIN_POOL_SIZE": "0",
     "MOU_REST_HOST": "localhost",
     "MOU_REST_PORT": "8080",
+    "MOU_SNAPSHOT_MODE": "full",  # "full" copies or "delta" (changes-only) snapshots
 }
 
 AUTH_SERVICE_ACCOUNT = "mou-service-account"
@@ -4,10 +4,13 @@ import base64
 import io
 import logging
 import time
-from typing import Dict, List, Tuple, cast
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Union, cast
 
 import pandas as pd  # type: ignore[import]
+import pymongo  # type: ignore[import]
 import pymongo.errors  # type: ignore[import]
+from bson.objectid import ObjectId  # type: ignore[import]
 from motor.motor_tornado import MotorClient  # type: ignore
 from tornado import web
 
@@ -17,16 +20,110 @@ from ..utils.mongo_tools import DocumentNotFoundError, Mongofier
 from . import columns
 
 _LIVE_COLLECTION = "LIVE_COLLECTION"
+_SNAPSHOT_CATALOG = "snapshots"  # in each "<wbs>-supplemental" database
+
+COLLECTION_NAMES_CACHE_AGE = 60  # seconds, in case a collection is made elsewhere
+TABLE_CURSOR_BATCH_SIZE = 500  # records per round trip, when iterating a table
+LIVE_TABLE_CACHE_SIZE = 32  # live tables & FTE groups (per version & filters)
+LIVE_TABLE_CACHE_AGE = 60  # seconds, in case the live collection is written elsewhere
+MAX_DELTA_CHAIN = 8  # delta snapshots stacked on a full snapshot, before another full
+
+_IS_DELETED = utils.MoUDataAdaptor.IS_DELETED
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """A declarative index on a collection's (human-friendly) field names."""
+
+    name: str
+    fields: Tuple[str, ...]
+    not_deleted_only: bool = False  # partial index, excluding deleted records
+    unique: bool = False
+
+    def get_keys(self) -> List[Tuple[str, int]]:
+        """Get the mongofied keys for `create_index()`."""
+        return [(Mongofier.mongofy_key_name(f), pymongo.ASCENDING) for f in self.fields]
+
+    def get_options(self) -> Dict[str, Any]:
+        """Get the options for `create_index()`."""
+        options: Dict[str, Any] = {"name": self.name}
+        if self.not_deleted_only:
+            options["partialFilterExpression"] = {_IS_DELETED: False}
+        if self.unique:
+            options["unique"] = True
+        return options
+
+
+# the indexes match the read queries' shapes (see `_get_table_query()`)
+_TABLE_INDEXES: Tuple[IndexSpec, ...] = (
+    IndexSpec(
+        "institution_labor_deleted",
+        (columns.INSTITUTION, columns.LABOR_CAT, _IS_DELETED),
+    ),
+    IndexSpec("labor_not_deleted", (columns.LABOR_CAT,), not_deleted_only=True),
+)
+
+# a snapshot's query can't use a partial index, see `_get_table_query()`
+_SNAPSHOT_TABLE_INDEXES: Tuple[IndexSpec, ...] = (
+    IndexSpec(
+        "institution_labor_deleted",
+        (columns.INSTITUTION, columns.LABOR_CAT, _IS_DELETED),
+    ),
+    IndexSpec("labor_deleted", (columns.LABOR_CAT, _IS_DELETED)),
+)
+
+INDEX_SPECS: Dict[str, Tuple[IndexSpec, ...]] = {
+    "live": _TABLE_INDEXES + (IndexSpec("timestamp", (columns.TIMESTAMP,)),),
+    "snapshot": _SNAPSHOT_TABLE_INDEXES,
+    "supplemental": (),  # singleton documents
+    "catalog": (IndexSpec("timestamp", ("timestamp",), unique=True),),
+}
+
+# indexes made by earlier versions, which are dropped wherever they're found
+_RETIRED_INDEX_NAMES: Tuple[str, ...] = (
+    f"{Mongofier.mongofy_key_name(columns.INSTITUTION)}_index",
+    f"{Mongofier.mongofy_key_name(columns.LABOR_CAT)}_index",
+    "sort_not_deleted",  # for paged reads
+    "sort",  # for paged reads, in snapshots
+)
 
 
 class MoUDatabaseClient:
     """MotorClient with additional guardrails for MoU things."""
 
     def __init__(
-        self, motor_client: MotorClient, data_adaptor: utils.MoUDataAdaptor
+        self,
+        motor_client: MotorClient,
+        data_adaptor: utils.MoUDataAdaptor,
+        delta_snapshots: bool = False,
     ) -> None:
         self.data_adaptor = data_adaptor
+        self.delta_snapshots = delta_snapshots
         self._mongo = motor_client
+        self._indexed_colls: Set[Tuple[str, str]] = set()  # (wbs_db, snap_coll)
+        self._coll_names_cache: Dict[str, Tuple[float, List[str]]] = {}
+        # snapshots are immutable, so their layers & records never change
+        self._snapshot_layers: Dict[Tuple[str, str], List[str]] = {}
+        # the live collections change, so their cached reads are keyed by version
+        # -- which only counts this process's writes, so the reads also expire
+        self._live_versions: Dict[str, int] = {}  # bumped after every write
+        self._live_tables: utils.LRUCache[
+            Tuple[Any, ...], types.Table
+        ] = utils.LRUCache(LIVE_TABLE_CACHE_SIZE, max_age=LIVE_TABLE_CACHE_AGE)
+        self._live_fte_groups: utils.LRUCache[
+            Tuple[Any, ...], List[Tuple[types.Record, int]]
+        ] = utils.LRUCache(LIVE_TABLE_CACHE_SIZE, max_age=LIVE_TABLE_CACHE_AGE)
+
+    def _bump_live_version(self, wbs_db: str) -> None:
+        """Invalidate the live collection's cached reads (call after a write).
+
+        The stale reads aren't removed, they just age out of the caches.
+        """
+        self._live_versions[wbs_db] = self._live_versions.get(wbs_db, 0) + 1
+
+    def _get_live_cache_key(self, wbs_db: str, *filters: Any) -> Tuple[Any, ...]:
+        """Get the cache key for a read of the current live collection."""
+        return (wbs_db, self._live_versions.get(wbs_db, 0)) + filters
 
     async def _create_live_collection(  # pylint: disable=R0913
         self,
@@ -98,7 +195,7 @@ class MoUDatabaseClient:
         for row in raw_table:
             # check for extra keys
             if not all(
-                k in self.data_adaptor.tc_cache.get_columns() for k in row.keys()
+                self.data_adaptor.tc_cache.is_column(str(k)) for k in row.keys()
             ):
                 raise web.HTTPError(
                     422,
@@ -157,12 +254,27 @@ class MoUDatabaseClient:
         ]
 
     async def _list_collection_names(self, db: str) -> List[str]:
-        """Return collection names in database."""
-        return [
+        """Return collection names in database.
+
+        The names are cached per database. Any method that creates or
+        drops a collection needs to call `_invalidate_collection_names()`.
+        """
+        if db in self._coll_names_cache:
+            cached_at, names = self._coll_names_cache[db]
+            if time.time() - cached_at < COLLECTION_NAMES_CACHE_AGE:
+                return list(names)
+
+        names = [
             n
             for n in await self._mongo[db].list_collection_names()
             if n not in EXCLUDE_COLLECTIONS
         ]
+        self._coll_names_cache[db] = (time.time(), names)
+        return list(names)
+
+    def _invalidate_collection_names(self, db: str) -> None:
+        """Forget the cached collection names for the database."""
+        self._coll_names_cache.pop(db, None)
 
     async def get_snapshot_info(
         self, wbs_db: str, snap_coll: str
@@ -175,6 +287,13 @@ class MoUDatabaseClient:
         doc = await self._get_supplemental_doc(wbs_db, snap_coll)
 
         logging.info(f"Snapshot Name [{doc['name']}] ({wbs_db=}, {snap_coll=})...")
+        return self._get_snapshot_info(doc)
+
+    @staticmethod
+    def _get_snapshot_info(
+        doc: Union[types.SupplementalDoc, types.SnapshotCatalogDoc]
+    ) -> types.SnapshotInfo:
+        """Get the snapshot's info from its Supplemental/catalog document."""
         return {
             "name": doc["name"],
             "creator": doc["creator"],
@@ -191,15 +310,41 @@ class MoUDatabaseClient:
         )
 
         await self._check_database_state(wbs_db)
+        self._check_institution(institution)
 
-        doc = await self._get_supplemental_doc(wbs_db, _LIVE_COLLECTION)
-        doc["snapshot_institution_values"].update({institution: vals})
-        await self._set_supplemental_doc(wbs_db, _LIVE_COLLECTION, doc)
+        # only set this institution's values, so concurrent writes don't clobber
+        coll_obj = self._mongo[f"{wbs_db}-supplemental"][_LIVE_COLLECTION]
+        res = await coll_obj.update_one(
+            {"timestamp": _LIVE_COLLECTION},
+            {"$set": {f"snapshot_institution_values.{institution}": vals}},
+        )
+        if not res.matched_count:
+            raise DocumentNotFoundError(
+                f"No Supplemental document found for snap_coll='{_LIVE_COLLECTION}'."
+            )
 
         logging.info(
             f"Upserted Institution's Values ({wbs_db=}, {institution=}, {vals=})."
         )
 
+    def _check_institution(self, institution: str) -> None:
+        """Raise 400 if the institution is unknown.
+
+        Its name is used in a (dotted) field path, so it must be a known one.
+        """
+        if not self.data_adaptor.tc_cache.get_institution(institution):
+            raise web.HTTPError(400, reason=f"Unknown institution: {institution!r}")
+
+    @staticmethod
+    def _check_institution_format(institution: str) -> None:
+        """Raise 400 if the institution can't be used in a (dotted) field path.
+
+        Snapshots may hold institutions that are no longer known, so reads
+        only check the format.
+        """
+        if not institution or "." in institution or institution.startswith("$"):
+            raise web.HTTPError(400, reason=f"Invalid institution: {institution!r}")
+
     async def _check_database_state(self, wbs_db: str) -> None:
         """Raise 422 if there are no collections."""
         if await self._list_collection_names(wbs_db):
@@ -221,6 +366,7 @@ class MoUDatabaseClient:
         logging.debug(f"Getting Institution's Values ({wbs_db=}, {institution=})...")
 
         await self._check_database_state(wbs_db)
+        self._check_institution_format(institution)
 
         vals: types.InstitutionValues = {
             "phds_authors": None,
@@ -238,7 +384,11 @@ class MoUDatabaseClient:
             snapshot_timestamp = _LIVE_COLLECTION
 
         try:
-            doc = await self._get_supplemental_doc(wbs_db, snapshot_timestamp)
+            doc = await self._get_supplemental_doc(
+                wbs_db,
+                snapshot_timestamp,
+                fields=[f"snapshot_institution_values.{institution}"],
+            )
         except DocumentNotFoundError as e:
             logging.warning(str(e))
             return vals
@@ -251,10 +401,45 @@ class MoUDatabaseClient:
             logging.info(f"Institution has no values ({wbs_db=}, {institution=}).")
             return vals
 
+    async def get_all_institution_values(
+        self, wbs_db: str, snapshot_timestamp: str
+    ) -> Dict[str, types.InstitutionValues]:
+        """Get the values for every institution (that has values)."""
+        logging.debug(f"Getting All Institutions' Values ({wbs_db=})...")
+
+        await self._check_database_state(wbs_db)
+
+        if not snapshot_timestamp:
+            snapshot_timestamp = _LIVE_COLLECTION
+
+        try:
+            doc = await self._get_supplemental_doc(
+                wbs_db, snapshot_timestamp, fields=["snapshot_institution_values"]
+            )
+        except DocumentNotFoundError as e:
+            logging.warning(str(e))
+            return {}
+
+        all_insts_values = doc.get("snapshot_institution_values", {})
+        logging.info(
+            f"All Institutions' Values: {len(all_insts_values)} institutions ({wbs_db=})."
+        )
+        return all_insts_values
+
     async def _get_supplemental_doc(
-        self, wbs_db: str, snap_coll: str
+        self, wbs_db: str, snap_coll: str, fields: Optional[List[str]] = None
     ) -> types.SupplementalDoc:
-        doc = await self._mongo[f"{wbs_db}-supplemental"][snap_coll].find_one()
+        """Get the Supplemental document.
+
+        If `fields` is given, only those (dotted) fields (and the
+        timestamp) are fetched.
+        """
+        projection = None
+        if fields:
+            projection = {f: True for f in fields + ["timestamp"]}
+
+        coll_obj = self._mongo[f"{wbs_db}-supplemental"][snap_coll]
+        doc = await coll_obj.find_one({}, projection)
         if not doc:
             raise DocumentNotFoundError(
                 f"No Supplemental document found for {snap_coll=}."
@@ -289,9 +474,13 @@ class MoUDatabaseClient:
         creator: str,
         all_insts_values: Dict[str, types.InstitutionValues],
         admin_only: bool,
+        delta_base: str = "",
     ) -> None:
         logging.debug(f"Creating Supplemental DB/Document ({wbs_db=}, {snap_coll=})...")
 
+        if admin_only:
+            name = f"{name} (admin-only)"
+
         # drop the collection if it already exists
         await self._mongo[f"{wbs_db}-supplemental"].drop_collection(snap_coll)
 
@@ -302,14 +491,74 @@ class MoUDatabaseClient:
             "creator": creator,
             "snapshot_institution_values": all_insts_values if all_insts_values else {},
             "admin_only": admin_only,
+            "delta_base": delta_base,
         }
         await self._set_supplemental_doc(wbs_db, snap_coll, doc)
+        self._invalidate_collection_names(f"{wbs_db}-supplemental")
+        if snap_coll != _LIVE_COLLECTION:
+            await self._upsert_snapshot_catalog_doc(wbs_db, doc)
 
         logging.debug(
             f"Created Supplemental Document ({wbs_db=}, {snap_coll=}): "
             f"{await self._get_supplemental_doc(wbs_db, snap_coll)}."
         )
 
+    async def _upsert_snapshot_catalog_doc(
+        self, wbs_db: str, supplemental_doc: types.SupplementalDoc
+    ) -> None:
+        """Insert/update the snapshot's document in the snapshot catalog."""
+        snap_coll = supplemental_doc["timestamp"]
+
+        # count the snapshot's view (a delta snapshot has several layers)
+        n_records = 0
+        query = self._get_table_query("", "", snap_coll)
+        async for coll_obj, layer_query in self._iter_layers(wbs_db, snap_coll, query):
+            n_records += await coll_obj.count_documents(layer_query)
+        stats = await self._mongo[wbs_db].command("collStats", snap_coll)
+
+        doc: types.SnapshotCatalogDoc = {
+            "timestamp": snap_coll,
+            "name": supplemental_doc["name"],
+            "creator": supplemental_doc["creator"],
+            "admin_only": supplemental_doc["admin_only"],
+            "n_records": n_records,
+            "size": stats["size"],
+        }
+
+        catalog_db = f"{wbs_db}-supplemental"
+        coll_obj = self._mongo[catalog_db][_SNAPSHOT_CATALOG]
+        await coll_obj.replace_one({"timestamp": snap_coll}, doc, upsert=True)
+        self._invalidate_collection_names(catalog_db)
+        await self._ensure_collection_indexed_once(catalog_db, _SNAPSHOT_CATALOG)
+
+    async def backfill_snapshot_catalogs(self) -> None:
+        """Add any uncataloged snapshots to their snapshot catalog.
+
+        Call once at startup. Snapshots made before the catalog existed
+        are only known by their collections.
+        """
+        logging.debug("Back-filling Snapshot Catalogs...")
+
+        for wbs_db in await self._list_database_names():
+            if wbs_db.endswith("-supplemental"):
+                continue
+
+            coll_obj = self._mongo[f"{wbs_db}-supplemental"][_SNAPSHOT_CATALOG]
+            cataloged = [d["timestamp"] async for d in coll_obj.find({}, ["timestamp"])]
+
+            for snap_coll in await self._list_collection_names(wbs_db):
+                if snap_coll == _LIVE_COLLECTION or snap_coll in cataloged:
+                    continue
+                try:
+                    doc = await self._get_supplemental_doc(wbs_db, snap_coll)
+                except DocumentNotFoundError as e:
+                    logging.warning(str(e))
+                    continue
+                await self._upsert_snapshot_catalog_doc(wbs_db, doc)
+                logging.info(f"Cataloged snapshot {snap_coll} ({wbs_db=}).")
+
+        logging.debug("Back-filled Snapshot Catalogs.")
+
     async def _ingest_new_collection(  # pylint: disable=R0913
         self,
         wbs_db: str,
@@ -329,85 +578,425 @@ class MoUDatabaseClient:
                 f"A Live Collection cannot be admin-only ({wbs_db=} {snap_coll=} {admin_only=})."
             )
 
-        if admin_only:
-            name = f"{name} (admin-only)"
+        # Ingest
+        records = [self.data_adaptor.mongofy_record(wbs_db, r) for r in table]
+        await self._create_collection(wbs_db, snap_coll, records)
+
+        # create supplemental document
+        await self._create_supplemental_db_document(
+            wbs_db, snap_coll, name, creator, all_insts_values, admin_only
+        )
+
+    async def _ingest_delta_collection(  # pylint: disable=R0913
+        self,
+        wbs_db: str,
+        snap_coll: str,
+        name: str,
+        creator: str,
+        all_insts_values: Dict[str, types.InstitutionValues],
+        admin_only: bool,
+    ) -> bool:
+        """Add the live table's changes since the latest snapshot to a new collection.
+
+        Only the records added/changed since the latest snapshot are
+        copied, along with a tombstone for each record removed since. The
+        snapshot's view is reconstructed on read, see `_iter_layers()`.
+
+        Return False (and create nothing) if a full copy is warranted:
+        there's no previous snapshot, the chain of deltas is too long, or
+        the delta wouldn't be smaller than a full copy.
+        """
+        snapshots = [
+            c
+            for c in await self._list_collection_names(wbs_db)
+            if c != _LIVE_COLLECTION
+        ]
+        if not snapshots:
+            return False
+        delta_base = max(snapshots, key=float)
+        if len(await self._get_snapshot_layers(wbs_db, delta_base)) >= MAX_DELTA_CHAIN:
+            return False
+
+        # diff the demongofied records, like a full snapshot would store them
+        base_view = {
+            doc[columns.ID]: self.data_adaptor.demongofy_record(doc)
+            async for doc in self._iter_docs(
+                wbs_db, delta_base, self._get_table_query("", "", delta_base)
+            )
+        }
+        live_ids: Set[Any] = set()
+        docs: List[Dict[str, Any]] = []
+        query = self._get_table_query("", "")
+        async for doc in self._iter_docs(wbs_db, _LIVE_COLLECTION, query):
+            live_ids.add(doc[columns.ID])
+            record = self.data_adaptor.demongofy_record(doc)
+            if record != base_view.get(doc[columns.ID]):
+                docs.append(self.data_adaptor.mongofy_record(wbs_db, record))
+        for removed_id in base_view.keys() - live_ids:
+            docs.append({columns.ID: removed_id, _IS_DELETED: True})  # tombstone
+
+        if len(docs) >= len(live_ids):
+            return False
+
+        await self._create_collection(wbs_db, snap_coll, docs)
+        await self._create_supplemental_db_document(
+            wbs_db,
+            snap_coll,
+            name,
+            creator,
+            all_insts_values,
+            admin_only,
+            delta_base=delta_base,
+        )
+
+        logging.debug(
+            f"Created delta snapshot {snap_coll} ({wbs_db=}, {delta_base=}): "
+            f"{len(docs)} of {len(live_ids)} records."
+        )
+        return True
+
+    async def _copy_live_collection(self, wbs_db: str, snap_coll: str) -> None:
+        """Copy the live collection's (non-deleted) records to a new collection.
+
+        The copy is done by the database (`$out`), so the records never
+        leave the server. If collection already exists, replace.
+        """
+        # records written before `deleted` was always set, need it for `$match`
+        await self._ensure_collection_indexed_once(wbs_db, _LIVE_COLLECTION)
+
+        self._indexed_colls.discard((wbs_db, snap_coll))
+        self._snapshot_layers.pop((wbs_db, snap_coll), None)
+
+        pipeline = [{"$match": self._get_table_query("", "")}, {"$out": snap_coll}]
+        await self._mongo[wbs_db][_LIVE_COLLECTION].aggregate(pipeline).to_list(None)
+        self._invalidate_collection_names(wbs_db)
+
+        # `$out` doesn't copy indexes (other than `_id`)
+        await self._ensure_collection_indexes(wbs_db, snap_coll)
+
+    async def _create_collection(
+        self, wbs_db: str, snap_coll: str, docs: List[Dict[str, Any]]
+    ) -> None:
+        """Create an indexed collection with the (mongofied) documents.
 
+        If collection already exists, replace.
+        """
         db_obj = self._mongo[wbs_db]
 
         # drop the collection if it already exists
         await db_obj.drop_collection(snap_coll)
+        self._indexed_colls.discard((wbs_db, snap_coll))
+        self._snapshot_layers.pop((wbs_db, snap_coll), None)
 
         coll_obj = await db_obj.create_collection(snap_coll)
+        self._invalidate_collection_names(wbs_db)
         await self._ensure_collection_indexes(wbs_db, snap_coll)
 
-        # Ingest
-        await coll_obj.insert_many(
-            [self.data_adaptor.mongofy_record(wbs_db, r) for r in table]
-        )
-
-        # create supplemental document
-        await self._create_supplemental_db_document(
-            wbs_db, snap_coll, name, creator, all_insts_values, admin_only
-        )
+        for doc in docs:
+            doc.setdefault(_IS_DELETED, False)
+        if docs:  # an empty delta is valid
+            await coll_obj.insert_many(docs)
+
+        if snap_coll == _LIVE_COLLECTION:  # ingested
+            self._bump_live_version(wbs_db)
+
+    @staticmethod
+    def _get_collection_type(wbs_db: str, snap_coll: str) -> str:
+        """Get the collection's type, a key for `INDEX_SPECS`."""
+        if wbs_db.endswith("-supplemental"):
+            if snap_coll == _SNAPSHOT_CATALOG:
+                return "catalog"
+            return "supplemental"
+        if snap_coll == _LIVE_COLLECTION:
+            return "live"
+        return "snapshot"
 
     async def _ensure_collection_indexes(self, wbs_db: str, snap_coll: str) -> None:
-        """Create indexes in collection."""
+        """Create the collection's indexes, per `INDEX_SPECS`.
+
+        Also, drop any other indexes made here (by this or an earlier
+        version), but not those made by anyone else. And, mark the live
+        collection's legacy records as not deleted (snapshots are immutable).
+        """
         coll_obj = self._mongo[wbs_db][snap_coll]
+        coll_type = self._get_collection_type(wbs_db, snap_coll)
+        specs = INDEX_SPECS[coll_type]
 
-        _inst = Mongofier.mongofy_key_name(columns.INSTITUTION)
-        await coll_obj.create_index(_inst, name=f"{_inst}_index", unique=False)
+        if coll_type == "live":
+            # records written before `deleted` was always set
+            await coll_obj.update_many(
+                {_IS_DELETED: {"$exists": False}}, {"$set": {_IS_DELETED: False}}
+            )
 
-        _labor = Mongofier.mongofy_key_name(columns.LABOR_CAT)
-        await coll_obj.create_index(_labor, name=f"{_labor}_index", unique=False)
+        for spec in specs:
+            await coll_obj.create_index(spec.get_keys(), **spec.get_options())
 
+        names = [spec.name for spec in specs]
+        ours = {spec.name for specs_ in INDEX_SPECS.values() for spec in specs_}
+        ours |= set(_RETIRED_INDEX_NAMES)
         async for index in coll_obj.list_indexes():
-            logging.debug(index)
+            if index["name"] in ours and index["name"] not in names:
+                logging.info(
+                    f"Dropping index {index['name']} ({wbs_db=}, {snap_coll=})"
+                )
+                await coll_obj.drop_index(index["name"])
+            else:
+                logging.debug(index)
+
+        self._indexed_colls.add((wbs_db, snap_coll))
 
-    async def _ensure_all_db_indexes(self) -> None:
-        """Create all indexes in all databases."""
+    async def ensure_all_db_indexes(self) -> None:
+        """Create all indexes in all databases.
+
+        Call once at startup. New collections are indexed as they are
+        created, see `_ingest_new_collection()`.
+        """
         logging.debug("Ensuring All Databases' Indexes...")
 
         for wbs_db in await self._list_database_names():
             for snap_coll in await self._list_collection_names(wbs_db):
-                await self._ensure_collection_indexes(wbs_db, snap_coll)
+                if (wbs_db, snap_coll) not in self._indexed_colls:
+                    await self._ensure_collection_indexes(wbs_db, snap_coll)
 
         logging.debug("Ensured All Databases' Indexes.")
 
-    async def get_table(
-        self, wbs_db: str, snap_coll: str = "", labor: str = "", institution: str = ""
-    ) -> types.Table:
-        """Return the table from the collection name."""
+    async def _ensure_collection_indexed_once(
+        self, wbs_db: str, snap_coll: str
+    ) -> None:
+        """Index the collection, if it exists but wasn't indexed by this process."""
+        if (wbs_db, snap_coll) in self._indexed_colls:
+            return
+        # don't implicitly create a collection by indexing it
+        if snap_coll in await self._list_collection_names(wbs_db):
+            await self._ensure_collection_indexes(wbs_db, snap_coll)
+
+    @staticmethod
+    def _get_table_query(
+        labor: str, institution: str, snap_coll: str = _LIVE_COLLECTION
+    ) -> Dict[str, Any]:
+        """Get the query for filtering a table by labor and/or institution.
+
+        Deleted records are always excluded. A snapshot's legacy records
+        may not have `deleted` (unlike the live collection's, they're never
+        back-filled), so these are not deleted.
+        """
+        query: Dict[str, Any] = {}
+        if labor:
+            query[Mongofier.mongofy_key_name(columns.LABOR_CAT)] = labor
+        if institution:
+            query[Mongofier.mongofy_key_name(columns.INSTITUTION)] = institution
+        if snap_coll == _LIVE_COLLECTION:
+            query[_IS_DELETED] = False
+        else:
+            query[_IS_DELETED] = {"$ne": True}
+        return query
+
+    async def _get_snapshot_layers(self, wbs_db: str, snap_coll: str) -> List[str]:
+        """Get the collections that make up the snapshot's view, newest first.
+
+        A full snapshot (or the live collection) is just itself. A delta
+        snapshot is itself followed by its base snapshot's layers. Only
+        cached once every layer's supplemental document is found, since a
+        snapshot's collection is made before its supplemental document.
+        """
+        if snap_coll == _LIVE_COLLECTION:
+            return [snap_coll]
+        if (wbs_db, snap_coll) in self._snapshot_layers:
+            return list(self._snapshot_layers[(wbs_db, snap_coll)])
+
+        layers = [snap_coll]
+        while True:
+            try:
+                doc = await self._get_supplemental_doc(wbs_db, layers[-1])
+            except (DocumentNotFoundError, pymongo.errors.InvalidName):
+                return layers  # not (yet) known to be complete, so don't cache
+            if not doc.get("delta_base"):  # full snapshot
+                break
+            layers.append(doc["delta_base"])
+
+        self._snapshot_layers[(wbs_db, snap_coll)] = layers
+        return list(layers)
+
+    async def _iter_layers(
+        self, wbs_db: str, snap_coll: str, query: Dict[str, Any]
+    ) -> AsyncIterator[Tuple[Any, Dict[str, Any]]]:
+        """Yield each of the snapshot's layers (collection) with its query.
+
+        Each layer's query excludes the records (and tombstones) in newer
+        layers, so together the layers' results make the snapshot's view.
+        """
+        layers = await self._get_snapshot_layers(wbs_db, snap_coll)
+        seen: List[Any] = []
+        for i, layer in enumerate(layers):
+            await self._ensure_collection_indexed_once(wbs_db, layer)
+            coll_obj = self._mongo[wbs_db][layer]
+            if seen:
+                yield coll_obj, dict(query, **{columns.ID: {"$nin": seen}})
+            else:
+                yield coll_obj, query
+            if i < len(layers) - 1:
+                seen.extend(
+                    [d[columns.ID] async for d in coll_obj.find({}, {columns.ID: True})]
+                )
+
+    async def _iter_docs(
+        self,
+        wbs_db: str,
+        snap_coll: str,
+        query: Dict[str, Any],
+        projection: Optional[Dict[str, bool]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the snapshot's (mongofied) documents matching the query."""
+        async for coll_obj, layer_query in self._iter_layers(wbs_db, snap_coll, query):
+            cursor = coll_obj.find(
+                layer_query, projection, batch_size=TABLE_CURSOR_BATCH_SIZE
+            )
+            async for doc in cursor:
+                yield doc
+
+    def _get_table_projection(
+        self, fields: Optional[List[str]]
+    ) -> Optional[Dict[str, bool]]:
+        """Get the projection for only getting `fields` (and the id)."""
+        if not fields:
+            return None
+        return {Mongofier.mongofy_key_name(f): True for f in fields}
+
+    async def iter_table(  # pylint: disable=R0913
+        self,
+        wbs_db: str,
+        snap_coll: str = "",
+        labor: str = "",
+        institution: str = "",
+        fields: Optional[List[str]] = None,
+    ) -> AsyncIterator[types.Record]:
+        """Yield the table's records from the collection name, one-by-one.
+
+        Records are fetched from the database in batches of
+        `TABLE_CURSOR_BATCH_SIZE`. If `fields` is given, only those
+        fields (and the id) are fetched.
+        """
         if not snap_coll:
             snap_coll = _LIVE_COLLECTION
 
         logging.debug(f"Getting from {snap_coll} ({wbs_db=})...")
 
         await self._check_database_state(wbs_db)
-        await self._ensure_all_db_indexes()
+        await self._ensure_collection_indexed_once(wbs_db, snap_coll)
 
-        query = {}
-        if labor:
-            query[Mongofier.mongofy_key_name(columns.LABOR_CAT)] = labor
-        if institution:
-            query[Mongofier.mongofy_key_name(columns.INSTITUTION)] = institution
+        query = self._get_table_query(labor, institution, snap_coll)
+        projection = self._get_table_projection(fields)
 
-        # build demongofied table
-        table: types.Table = []
-        i, dels = 0, 0
-        async for record in self._mongo[wbs_db][snap_coll].find(query):
-            if record.get(self.data_adaptor.IS_DELETED):
-                dels += 1
-                continue
-            table.append(self.data_adaptor.demongofy_record(record))
+        # yield demongofied records
+        i = 0
+        async for record in self._iter_docs(wbs_db, snap_coll, query, projection):
+            yield self.data_adaptor.demongofy_record(record)
             i += 1
 
         logging.info(
             f"Table [{wbs_db=} {snap_coll=}] ({institution=}, {labor=}) "
-            f"has {i} records (and {dels} deleted records)."
+            f"has {i} records."
         )
 
+    async def get_table(  # pylint: disable=R0913
+        self,
+        wbs_db: str,
+        snap_coll: str = "",
+        labor: str = "",
+        institution: str = "",
+        fields: Optional[List[str]] = None,
+    ) -> types.Table:
+        """Return the table from the collection name.
+
+        If `fields` is given, only those fields (and the id) are fetched.
+        The live table is cached until the next write.
+        """
+        cache_key = None
+        if snap_coll in ["", _LIVE_COLLECTION]:
+            cache_key = self._get_live_cache_key(
+                wbs_db, labor or "", institution or "", tuple(fields or [])
+            )
+            if (cached := self._live_tables.get(cache_key)) is not None:
+                return [dict(r) for r in cached]  # callers may modify the records
+
+        table = [
+            record
+            async for record in self.iter_table(
+                wbs_db, snap_coll, labor=labor, institution=institution, fields=fields
+            )
+        ]
+
+        if cache_key is not None:
+            self._live_tables.put(cache_key, [dict(r) for r in table])
         return table
 
+    async def get_fte_groups(
+        self, wbs_db: str, snap_coll: str = "", labor: str = "", institution: str = ""
+    ) -> List[Tuple[types.Record, int]]:
+        """Group the table's records by the values needed for total rows.
+
+        The grouping is done by the database (`$group`), so the table is
+        never materialized. Each group is a partial record along with the
+        number of records sharing its values. Grouping on the FTE value
+        itself keeps the totals' decimal arithmetic exact. The live table's
+        groups are cached until the next write.
+        """
+        if not snap_coll:
+            snap_coll = _LIVE_COLLECTION
+
+        cache_key = None
+        if snap_coll == _LIVE_COLLECTION:
+            cache_key = self._get_live_cache_key(wbs_db, labor or "", institution or "")
+            if (cached := self._live_fte_groups.get(cache_key)) is not None:
+                return [(dict(r), n) for r, n in cached]
+
+        logging.debug(f"Getting FTE groups from {snap_coll} ({wbs_db=})...")
+
+        await self._check_database_state(wbs_db)
+        await self._ensure_collection_indexed_once(wbs_db, snap_coll)
+
+        fields = [
+            columns.WBS_L2,
+            columns.WBS_L3,
+            columns.INSTITUTION,
+            columns.SOURCE_OF_FUNDS_US_ONLY,
+            columns.FTE,
+        ]
+        mongo_fields = [Mongofier.mongofy_key_name(f) for f in fields]
+
+        query = self._get_table_query(labor, institution, snap_coll)
+        group_stage = {
+            "$group": {
+                "_id": {m: f"${m}" for m in mongo_fields},
+                "n_records": {"$sum": 1},
+            }
+        }
+
+        # merge each layer's groups (a delta snapshot has several layers)
+        counts: Dict[Tuple[Any, ...], int] = {}
+        async for coll_obj, layer_query in self._iter_layers(wbs_db, snap_coll, query):
+            pipeline = [{"$match": layer_query}, group_stage]
+            async for group in coll_obj.aggregate(pipeline):
+                group_key = tuple(group["_id"].get(m) for m in mongo_fields)
+                counts[group_key] = counts.get(group_key, 0) + group["n_records"]
+
+        # build demongofied (partial) records
+        fte_groups: List[Tuple[types.Record, int]] = []
+        for group_key, n_records in counts.items():
+            record: types.Record = {}
+            for field, value in zip(fields, group_key):
+                record[field] = value if value is not None else ""  # like demongofy
+            fte_groups.append((record, n_records))
+
+        logging.info(
+            f"Table [{wbs_db=} {snap_coll=}] ({institution=}, {labor=}) "
+            f"has {len(fte_groups)} FTE groups."
+        )
+
+        if cache_key is not None:
+            self._live_fte_groups.put(cache_key, [(dict(r), n) for r, n in fte_groups])
+        return fte_groups
+
     async def upsert_record(
         self, wbs_db: str, record: types.Record, editor: str
     ) -> types.Record:
@@ -426,6 +1015,7 @@ class MoUDatabaseClient:
 
         # prep
         record = self.data_adaptor.mongofy_record(wbs_db, record)
+        record.setdefault(_IS_DELETED, False)
         coll_obj = self._mongo[wbs_db][_LIVE_COLLECTION]
 
         # if record has an ID -- replace it
@@ -438,9 +1028,72 @@ class MoUDatabaseClient:
             res = await coll_obj.insert_one(record)
             record[columns.ID] = res.inserted_id
             logging.info(f"Inserted {record} ({wbs_db=}) -> {res}.")
+        self._bump_live_version(wbs_db)  # also for delete_record & restore_record
 
         return self.data_adaptor.demongofy_record(record)
 
+    async def upsert_records(
+        self, wbs_db: str, records: types.Table, editor: str
+    ) -> List[Tuple[Optional[types.Record], str]]:
+        """Insert/update many records with one (unordered) bulk write.
+
+        Each record is validated on its own, so one bad record doesn't
+        stop the others. Return a result per record, in the same order:
+        the upserted record and "", or None and the error message.
+        """
+        logging.debug(f"Upserting {len(records)} records ({wbs_db=})...")
+
+        await self._check_database_state(wbs_db)
+
+        results: List[Tuple[Optional[types.Record], str]] = []
+        writes: List[Any] = []
+        write_indexes: List[int] = []  # index in `results` of each write
+
+        now = time.time()
+        for record in records:
+            # record timestamp and editor's name
+            record[columns.TIMESTAMP] = now
+            if editor:
+                record[columns.EDITOR] = editor
+
+            # prep
+            try:
+                record = self.data_adaptor.mongofy_record(wbs_db, record)
+            except Exception as e:
+                results.append((None, str(e)))
+                continue
+            record.setdefault(_IS_DELETED, False)
+
+            # if record has an ID -- replace it, otherwise -- create it
+            if record.get(columns.ID):
+                writes.append(
+                    pymongo.ReplaceOne({columns.ID: record[columns.ID]}, record)
+                )
+            else:
+                record[columns.ID] = ObjectId()
+                writes.append(pymongo.InsertOne(record))
+            write_indexes.append(len(results))
+            results.append((record, ""))
+
+        if writes:
+            coll_obj = self._mongo[wbs_db][_LIVE_COLLECTION]
+            try:
+                res = await coll_obj.bulk_write(writes, ordered=False)
+                logging.info(
+                    f"Bulk-upserted records ({wbs_db=}) -> {res.bulk_api_result}."
+                )
+            except pymongo.errors.BulkWriteError as e:
+                for error in e.details["writeErrors"]:
+                    results[write_indexes[error["index"]]] = (None, error["errmsg"])
+                logging.error(f"Bulk-upserted records with errors ({wbs_db=}) -> {e}.")
+            finally:  # an unordered bulk write may be partially applied
+                self._bump_live_version(wbs_db)
+
+        return [
+            (self.data_adaptor.demongofy_record(r) if r else None, err)
+            for r, err in results
+        ]
+
     async def _set_is_deleted_status(
         self, wbs_db: str, record_id: str, is_deleted: bool, editor: str = ""
     ) -> types.Record:
@@ -474,62 +1127,81 @@ class MoUDatabaseClient:
     async def snapshot_live_collection(
         self, wbs_db: str, name: str, creator: str, admin_only: bool
     ) -> str:
-        """Create a snapshot collection by copying the live collection."""
+        """Create a snapshot collection by copying the live collection.
+
+        With `delta_snapshots`, only the changes since the latest snapshot
+        are copied, when that's worthwhile.
+        """
         logging.debug(f"Snapshotting ({wbs_db=}, {creator=})...")
 
         await self._check_database_state(wbs_db)
 
-        table = await self.get_table(wbs_db, _LIVE_COLLECTION)
         supplemental_doc = await self._get_supplemental_doc(wbs_db, _LIVE_COLLECTION)
 
         snap_coll = str(time.time())
-        await self._ingest_new_collection(
-            wbs_db,
-            snap_coll,
-            table,
-            name,
-            creator,
-            supplemental_doc["snapshot_institution_values"],
-            admin_only,
-        )
+        if not (
+            self.delta_snapshots
+            and await self._ingest_delta_collection(
+                wbs_db,
+                snap_coll,
+                name,
+                creator,
+                supplemental_doc["snapshot_institution_values"],
+                admin_only,
+            )
+        ):
+            await self._copy_live_collection(wbs_db, snap_coll)
+            await self._create_supplemental_db_document(
+                wbs_db,
+                snap_coll,
+                name,
+                creator,
+                supplemental_doc["snapshot_institution_values"],
+                admin_only,
+            )
 
-        # set all *_confirmed values to False
-        for inst, vals in supplemental_doc["snapshot_institution_values"].items():
-            vals["headcounts_confirmed"] = False
-            vals["computing_confirmed"] = False
-            await self.upsert_institution_values(wbs_db, inst, vals)
+        # set all *_confirmed values to False -- in one update
+        flags = {
+            f"snapshot_institution_values.{inst}.{confirmed}": False
+            for inst in supplemental_doc["snapshot_institution_values"]
+            for confirmed in ["headcounts_confirmed", "computing_confirmed"]
+        }
+        if flags:
+            coll_obj = self._mongo[f"{wbs_db}-supplemental"][_LIVE_COLLECTION]
+            await coll_obj.update_one({"timestamp": _LIVE_COLLECTION}, {"$set": flags})
 
         logging.info(f"Snapshotted {snap_coll} ({wbs_db=}, {creator=}).")
         return snap_coll
 
-    async def _is_snapshot_admin_only(self, wbs_db: str, name: str) -> bool:
-        doc = await self._get_supplemental_doc(wbs_db, name)
-        return doc["admin_only"]
-
-    async def list_snapshot_timestamps(
+    async def list_snapshot_infos(
         self, wbs_db: str, exclude_admin_snaps: bool
-    ) -> List[str]:
-        """Return a list of the snapshot collections."""
-        logging.info(f"Getting Snapshot Timestamps ({wbs_db=})...")
+    ) -> List[types.SnapshotInfo]:
+        """Return the snapshots' infos, newest first.
 
-        await self._check_database_state(wbs_db)
+        The infos come from the snapshot catalog, in one (indexed) query.
+        """
+        logging.info(f"Getting Snapshot Infos ({wbs_db=})...")
 
-        snapshots = [
-            c
-            for c in await self._list_collection_names(wbs_db)
-            if c != _LIVE_COLLECTION
-        ]
+        await self._check_database_state(wbs_db)
 
-        if exclude_admin_snaps:
-            snapshots = [
-                s
-                for s in snapshots
-                if not await self._is_snapshot_admin_only(wbs_db, s)
-            ]
+        query = {"admin_only": False} if exclude_admin_snaps else {}
+        coll_obj = self._mongo[f"{wbs_db}-supplemental"][_SNAPSHOT_CATALOG]
+        cursor = coll_obj.find(query).sort("timestamp", pymongo.DESCENDING)
+        snapshots = [self._get_snapshot_info(doc) async for doc in cursor]
 
-        logging.debug(f"Snapshot Timestamps {snapshots} ({wbs_db=}).")
+        logging.debug(f"Snapshot Infos {snapshots} ({wbs_db=}).")
         return snapshots
 
+    async def is_snapshot_cataloged(self, wbs_db: str, snap_coll: str) -> bool:
+        """Return whether the snapshot is in the snapshot catalog.
+
+        A snapshot is cataloged once it's complete, so one that's missing
+        is either nonexistent or still being made.
+        """
+        coll_obj = self._mongo[f"{wbs_db}-supplemental"][_SNAPSHOT_CATALOG]
+        doc = await coll_obj.find_one({"timestamp": snap_coll}, ["timestamp"])
+        return doc is not None
+
     async def restore_record(self, wbs_db: str, record_id: str) -> None:
         """Mark the record as not deleted."""
         logging.debug(f"Restoring {record_id} ({wbs_db=})...")
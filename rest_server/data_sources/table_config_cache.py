@@ -3,7 +3,20 @@
 
 import logging
 import time
-from typing import Any, Dict, Final, List, Tuple, TypedDict, Union
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import (
+    Any,
+    Dict,
+    Final,
+    FrozenSet,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    TypedDict,
+    Union,
+)
 
 from . import columns, todays_institutions, wbs
 
@@ -46,6 +59,90 @@ _LABOR_CATEGORY_DICTIONARY: Dict[str, str] = {
 
 MAX_CACHE_AGE = 60 * 60  # seconds
 
+_ConditionalDropdownMenus = Dict[str, Tuple[str, Dict[str, List[str]]]]
+
+
+@dataclass(frozen=True)
+class _CompiledColumnConfigs:  # pylint: disable=R0902
+    """Lookups derived from the column configs, precomputed once per (re)build.
+
+    These are shared, so `TableConfigCache`'s getters return read-only views.
+    """
+
+    columns: Tuple[str, ...]
+    column_set: FrozenSet[str]
+    on_the_fly_fields: FrozenSet[str]
+    numerics: Tuple[str, ...]
+    non_editables: Tuple[str, ...]
+    hiddens: Tuple[str, ...]
+    border_left_columns: Tuple[str, ...]
+    widths: Dict[str, int]
+    tooltips: Dict[str, str]
+    columns_by_sort_precedence: Tuple[str, ...]
+    # per WBS L1
+    simple_dropdown_menus: Dict[str, Dict[str, List[str]]]
+    conditional_dropdown_menus: Dict[str, _ConditionalDropdownMenus]
+    dropdowns: Dict[str, Tuple[str, ...]]
+
+    @staticmethod
+    def compile(
+        column_configs: Dict[str, _ColumnConfigTypedDict]
+    ) -> "_CompiledColumnConfigs":
+        """Factory function."""
+
+        def cols_where(flag: str) -> Tuple[str, ...]:
+            return tuple(
+                col for col, config in column_configs.items() if config.get(flag)
+            )
+
+        simple_menus: Dict[str, Dict[str, List[str]]] = {}
+        conditional_menus: Dict[str, _ConditionalDropdownMenus] = {}
+        for l1, l2s in wbs.WORK_BREAKDOWN_STRUCTURES.items():
+            simple_menus[l1] = {
+                col: config["options"]
+                for col, config in column_configs.items()
+                if "options" in config
+            }
+            simple_menus[l1][columns.WBS_L2] = list(l2s.keys())
+            conditional_menus[l1] = {
+                col: (config["conditional_parent"], config["conditional_options"])
+                for col, config in column_configs.items()
+                if ("conditional_parent" in config)
+                and ("conditional_options" in config)
+            }
+            conditional_menus[l1][columns.WBS_L3] = (columns.WBS_L2, l2s)
+
+        sort_values = {
+            col: config["sort_value"]
+            for col, config in column_configs.items()
+            if "sort_value" in config
+        }
+
+        return _CompiledColumnConfigs(
+            columns=tuple(column_configs.keys()),
+            column_set=frozenset(column_configs.keys()),
+            on_the_fly_fields=frozenset(cols_where("on_the_fly")),
+            numerics=cols_where("numeric"),
+            non_editables=cols_where("non_editable"),
+            hiddens=cols_where("hidden"),
+            border_left_columns=cols_where("border_left"),
+            widths={col: config["width"] for col, config in column_configs.items()},
+            tooltips={
+                col: config["tooltip"]
+                for col, config in column_configs.items()
+                if config.get("tooltip")
+            },
+            columns_by_sort_precedence=tuple(
+                sorted(sort_values.keys(), key=lambda x: sort_values[x], reverse=True)
+            ),
+            simple_dropdown_menus=simple_menus,
+            conditional_dropdown_menus=conditional_menus,
+            dropdowns={
+                l1: tuple(simple_menus[l1].keys()) + tuple(conditional_menus[l1].keys())
+                for l1 in wbs.WORK_BREAKDOWN_STRUCTURES
+            },
+        )
+
 
 class TableConfigCache:
     """Manage the collection and parsing of the table config."""
@@ -63,15 +160,30 @@ class TableConfigCache:
         _column_configs: Dict[str, _ColumnConfigTypedDict],
         _institutions: List[todays_institutions.Institution],
     ) -> None:
-        self.column_configs, self.institutions = _column_configs, _institutions
+        self._set(_column_configs, _institutions)
+
+    def _set(
+        self,
+        column_configs: Dict[str, _ColumnConfigTypedDict],
+        institutions: List[todays_institutions.Institution],
+    ) -> None:
+        """Set the configs & institutions, and precompute their lookups."""
+        self.column_configs, self.institutions = column_configs, institutions
+        self._compiled = _CompiledColumnConfigs.compile(self.column_configs)
+        self._institutions_by_name: Dict[str, todays_institutions.Institution] = {}
+        for inst in self.institutions:  # first one wins, if there are duplicates
+            self._institutions_by_name.setdefault(inst.short_name, inst)
         self._timestamp = int(time.time())
 
     async def refresh(self) -> None:
         """Get/Create the most recent table-config doc."""
         if int(time.time()) - self._timestamp < MAX_CACHE_AGE:
             return
-        self.column_configs, self.institutions = await self._build()
-        self._timestamp = int(time.time())
+        self._set(*await self._build())
+
+    def get_timestamp(self) -> int:
+        """Get when the configs & institutions were (re)built."""
+        return self._timestamp
 
     @staticmethod
     async def _build() -> Tuple[
@@ -225,18 +337,27 @@ class TableConfigCache:
 
         return column_configs, institutions
 
+    def get_institution(
+        self, inst_name: str
+    ) -> Optional[todays_institutions.Institution]:
+        """Return the institution with the short name, if there is one."""
+        return self._institutions_by_name.get(inst_name)
+
     def us_or_non_us(self, inst_name: str) -> str:
         """Return "US" or "Non-US" per institution name."""
-        for inst in self.institutions:
-            if inst.short_name == inst_name:
-                if inst.is_us:
-                    return US
-                return NON_US
-        return ""
-
-    def get_columns(self) -> List[str]:
+        if not (inst := self.get_institution(inst_name)):
+            return ""
+        if inst.is_us:
+            return US
+        return NON_US
+
+    def get_columns(self) -> Tuple[str, ...]:
         """Get the columns."""
-        return list(self.column_configs.keys())
+        return self._compiled.columns
+
+    def is_column(self, col: str) -> bool:
+        """Return whether `col` is a column."""
+        return col in self._compiled.column_set
 
     def get_labor_categories_and_abbrevs(
         self,
@@ -254,104 +375,63 @@ class TableConfigCache:
         """Get the L3 categories for an L2 value."""
         return wbs.WORK_BREAKDOWN_STRUCTURES[l1][l2]
 
-    def get_simple_dropdown_menus(self, l1: str) -> Dict[str, List[str]]:
+    def get_simple_dropdown_menus(self, l1: str) -> Mapping[str, List[str]]:
         """Get the columns that are simple dropdowns, with their options."""
-        ret = {
-            col: config["options"]
-            for col, config in self.column_configs.items()
-            if "options" in config
-        }
-        ret[columns.WBS_L2] = self.get_l2_categories(l1)
-        return ret
+        return MappingProxyType(self._compiled.simple_dropdown_menus[l1])
 
     def get_conditional_dropdown_menus(
         self, l1: str
-    ) -> Dict[str, Tuple[str, Dict[str, List[str]]]]:
+    ) -> Mapping[str, Tuple[str, Dict[str, List[str]]]]:
         """Get the columns (and conditions) that are conditionally dropdowns.
 
         Example:
         {'Col-Name-A' : ('Parent-Col-Name-1', {'Parent-Val-I' : ['Option-Alpha', ...] } ) }
         """
-        ret = {
-            col: (config["conditional_parent"], config["conditional_options"])
-            for col, config in self.column_configs.items()
-            if ("conditional_parent" in config) and ("conditional_options" in config)
-        }
-        ret[columns.WBS_L3] = (columns.WBS_L2, wbs.WORK_BREAKDOWN_STRUCTURES[l1])
-        return ret
+        return MappingProxyType(self._compiled.conditional_dropdown_menus[l1])
 
-    def get_dropdowns(self, l1: str) -> List[str]:
+    def get_dropdowns(self, l1: str) -> Tuple[str, ...]:
         """Get the columns that are dropdowns."""
-        return list(self.get_simple_dropdown_menus(l1).keys()) + list(
-            self.get_conditional_dropdown_menus(l1).keys()
-        )
+        return self._compiled.dropdowns[l1]
 
-    def get_numerics(self) -> List[str]:
+    def get_numerics(self) -> Tuple[str, ...]:
         """Get the columns that have numeric data."""
-        return [
-            col for col, config in self.column_configs.items() if config.get("numeric")
-        ]
+        return self._compiled.numerics
 
-    def get_non_editables(self) -> List[str]:
+    def get_non_editables(self) -> Tuple[str, ...]:
         """Get the columns that are not editable."""
-        return [
-            col
-            for col, config in self.column_configs.items()
-            if config.get("non_editable")
-        ]
+        return self._compiled.non_editables
 
-    def get_hiddens(self) -> List[str]:
+    def get_hiddens(self) -> Tuple[str, ...]:
         """Get the columns that are hidden."""
-        return [
-            col for col, config in self.column_configs.items() if config.get("hidden")
-        ]
+        return self._compiled.hiddens
 
-    def get_widths(self) -> Dict[str, int]:
+    def get_widths(self) -> Mapping[str, int]:
         """Get the widths of each column."""
-        return {col: config["width"] for col, config in self.column_configs.items()}
+        return MappingProxyType(self._compiled.widths)
 
-    def get_tooltips(self) -> Dict[str, str]:
+    def get_tooltips(self) -> Mapping[str, str]:
         """Get the widths of each column."""
-        return {
-            col: config["tooltip"]
-            for col, config in self.column_configs.items()
-            if config.get("tooltip")
-        }
+        return MappingProxyType(self._compiled.tooltips)
 
-    def get_border_left_columns(self) -> List[str]:
+    def get_border_left_columns(self) -> Tuple[str, ...]:
         """Get the columns that have a left border."""
-        return [
-            col
-            for col, config in self.column_configs.items()
-            if config.get("border_left")
-        ]
+        return self._compiled.border_left_columns
 
     def get_page_size(self) -> int:  # pylint: disable=no-self-use
         """Get page size."""
         return 19
 
-    def get_on_the_fly_fields(self) -> List[str]:
+    def get_on_the_fly_fields(self) -> FrozenSet[str]:
         """Get names of fields created on-the-fly, data not stored."""
-        return [
-            col
-            for col, config in self.column_configs.items()
-            if config.get("on_the_fly")
-        ]
+        return self._compiled.on_the_fly_fields
+
+    def get_sort_precedence(self) -> Tuple[str, ...]:
+        """Get the columns the table is sorted by, most significant first."""
+        return self._compiled.columns_by_sort_precedence
 
     def sort_key(self, k: Dict[str, Union[int, float, str]]) -> Tuple[Any, ...]:
         """Sort key for the table."""
-        sort_keys: List[Union[int, float, str]] = []
-
-        column_orders = {
-            col: config["sort_value"]
-            for col, config in self.column_configs.items()
-            if "sort_value" in config
-        }
-        columns_by_precedence = sorted(
-            column_orders.keys(), key=lambda x: column_orders[x], reverse=True
+        # HACK: sort empty/missing values last
+        return tuple(
+            k.get(col, "ZZZZ") for col in self._compiled.columns_by_sort_precedence
         )
-
-        for col in columns_by_precedence:
-            sort_keys.append(k.get(col, "ZZZZ"))  # HACK: sort empty/missing values last
-
-        return tuple(sort_keys)
@@ -1,20 +1,34 @@
 """Routes handlers for the MoU REST API server interface."""
 
 
+import hashlib
 import json
 import logging
 from dataclasses import asdict
-from typing import Any
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
 
-from motor.motor_tornado import MotorClient  # type: ignore
 from rest_tools.server import RestHandler, handler  # type: ignore
+from tornado import escape, web
 
 from .config import AUTH_SERVICE_ACCOUNT, is_testing
 from .data_sources import columns, mou_db, table_config_cache, todays_institutions, wbs
-from .utils import types, utils
+from .utils import mongo_tools, types, utils
 
 _WBS_L1_REGEX_VALUES = "|".join(wbs.WORK_BREAKDOWN_STRUCTURES.keys())
 
+# fields needed to calculate the on-the-fly fields & the total rows
+_ON_THE_FLY_DEPENDENCIES = [
+    columns.INSTITUTION,
+    columns.SOURCE_OF_FUNDS_US_ONLY,
+    columns.FTE,
+]
+_TOTAL_ROWS_DEPENDENCIES = [columns.WBS_L2, columns.WBS_L3]
+
+SNAPSHOT_RESPONSE_CACHE_SIZE = 64  # serialized snapshot responses, kept in memory
+
+# {key: (etag, serialized response)}
+SnapshotResponseCache = utils.LRUCache[Tuple[Any, ...], Tuple[str, bytes]]
+
 
 if is_testing():
     def service_account_auth(**kwargs):  # type: ignore
@@ -36,8 +50,10 @@ class BaseMoUHandler(RestHandler):  # type: ignore  # pylint: disable=W0223
 
     def initialize(  # type: ignore  # pylint: disable=W0221
         self,
-        mongodb_url: str,
+        mou_db_client: mou_db.MoUDatabaseClient,
+        pool_metrics: mongo_tools.ConnectionPoolMetrics,
         tc_cache: table_config_cache.TableConfigCache,
+        snapshot_responses: SnapshotResponseCache,
         *args: Any,
         **kwargs: Any,
     ) -> None:
@@ -45,11 +61,47 @@ class BaseMoUHandler(RestHandler):  # type: ignore  # pylint: disable=W0223
         super().initialize(*args, **kwargs)
         # pylint: disable=W0201
         self.tc_cache = tc_cache
-        self.mou_db_client = mou_db.MoUDatabaseClient(
-            MotorClient(mongodb_url), utils.MoUDataAdaptor(self.tc_cache)
-        )
+        self.mou_db_client = mou_db_client  # app-scoped, shares one connection pool
+        self.pool_metrics = pool_metrics
+        self.snapshot_responses = snapshot_responses  # app-scoped
         self.tc_data_adaptor = utils.TableConfigDataAdaptor(self.tc_cache)
 
+    async def write_snapshot_response(
+        self,
+        wbs_l1: str,
+        snapshot: str,
+        key: Tuple[Any, ...],
+        get_response: Callable[[], Awaitable[Any]],
+    ) -> None:
+        """Write a snapshot's response, from the cache if it's there.
+
+        Snapshots are immutable, so their serialized responses are cached
+        along with a strong ETag. A matching `If-None-Match` gets a 304.
+        The on-the-fly fields come from the table config, so a refreshed
+        table config gets new responses & ETags.
+
+        Only a cataloged (complete) snapshot is cached; otherwise, 404.
+        """
+        tc_timestamp = self.tc_cache.get_timestamp()
+        key = (tc_timestamp,) + key
+
+        cached = self.snapshot_responses.get(key)
+        if cached is None:
+            if not await self.mou_db_client.is_snapshot_cataloged(wbs_l1, snapshot):
+                raise web.HTTPError(404, reason=f"Snapshot not found: {snapshot!r}")
+            body = escape.utf8(escape.json_encode(await get_response()))
+            digest = hashlib.sha1(f"{tc_timestamp}:".encode() + body).hexdigest()
+            cached = (f'"{digest}"', body)
+            self.snapshot_responses.put(key, cached)
+
+        etag, body = cached
+        self.set_header("Etag", etag)
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.write(body)
+
 
 # -----------------------------------------------------------------------------
 
@@ -81,31 +133,135 @@ class TableHandler(BaseMoUHandler):  # pylint: disable=W0223
         restore_id = self.get_argument("restore_id", default=None)
         labor = self.get_argument("labor", default=None)
         total_rows = self.get_argument("total_rows", default=False, type=bool)
+        fields = self.get_argument("fields", default=[])
+        if isinstance(fields, str):  # from the query string
+            fields = fields.split(",")
+
+        stream = self.get_argument("stream", default=False, type=bool)
 
         if restore_id:
             await self.mou_db_client.restore_record(wbs_l1, restore_id)
 
+        if stream:
+            await self._stream_table(
+                wbs_l1, collection, labor, institution, total_rows, fields
+            )
+            return
+        if collection:  # snapshots are immutable
+            key = (
+                "table", wbs_l1, collection, institution, labor, total_rows, tuple(fields)
+            )
+            await self.write_snapshot_response(
+                wbs_l1,
+                collection,
+                key,
+                lambda: self._get_table(
+                    wbs_l1, collection, labor, institution, total_rows, fields
+                ),
+            )
+            return
+
+        self.write(
+            await self._get_table(
+                wbs_l1, collection, labor, institution, total_rows, fields
+            )
+        )
+
+    async def _get_table(  # pylint: disable=R0913
+        self,
+        wbs_l1: str,
+        collection: str,
+        labor: str,
+        institution: str,
+        total_rows: bool,
+        fields: List[str],
+    ) -> Dict[str, types.Table]:
+        """Get the whole (sorted) table, with on-the-fly fields & total rows."""
+        projection = None
+        if fields:
+            projection = fields + _ON_THE_FLY_DEPENDENCIES
+            projection += list(self.tc_cache.get_sort_precedence())
+            if total_rows:
+                projection += _TOTAL_ROWS_DEPENDENCIES
+
         table = await self.mou_db_client.get_table(
-            wbs_l1, collection, labor=labor, institution=institution
+            wbs_l1, collection, labor=labor, institution=institution, fields=projection
         )
 
         # On-the-fly fields/rows
         for record in table:
             self.tc_data_adaptor.add_on_the_fly_fields(record)
+        totals = []
         if total_rows:
-            table.extend(
-                self.tc_data_adaptor.get_total_rows(
-                    wbs_l1,
-                    table,
-                    only_totals_w_data=labor or institution,
-                    with_us_non_us=not institution,
-                )
+            totals = self.tc_data_adaptor.get_total_rows(
+                wbs_l1,
+                table,
+                only_totals_w_data=bool(labor or institution),
+                with_us_non_us=not institution,
             )
 
-        # sort
+        table.extend(totals)
+
+        # sort -- before the projection, which may drop the sort columns
         table.sort(key=self.tc_cache.sort_key)
 
-        self.write({"table": table})
+        # only the requested fields (total rows are left whole)
+        if fields:
+            keep = set(fields) | {columns.ID}
+            table = [
+                r
+                if columns.TOTAL_COL in r
+                else {k: v for k, v in r.items() if k in keep}
+                for r in table
+            ]
+
+        return {"table": table}
+
+    async def _stream_table(  # pylint: disable=R0913
+        self,
+        wbs_l1: str,
+        collection: str,
+        labor: str,
+        institution: str,
+        total_rows: bool,
+        fields: List[str],
+    ) -> None:
+        """Write the table as newline-delimited JSON, one record per line.
+
+        The table is never held in memory, so the records are NOT sorted.
+        The total rows (calculated by the database) are written last.
+        """
+        self.set_header("Content-Type", "application/x-ndjson")
+
+        projection, keep = None, None
+        if fields:
+            projection = fields + _ON_THE_FLY_DEPENDENCIES
+            keep = set(fields) | {columns.ID}
+
+        i = 0
+        async for record in self.mou_db_client.iter_table(
+            wbs_l1, collection, labor=labor, institution=institution, fields=projection
+        ):
+            self.tc_data_adaptor.add_on_the_fly_fields(record)
+            if keep:
+                record = {k: v for k, v in record.items() if k in keep}
+            self.write(json.dumps(record) + "\n")
+            i += 1
+            if i % mou_db.TABLE_CURSOR_BATCH_SIZE == 0:
+                await self.flush()
+
+        if total_rows:
+            fte_groups = await self.mou_db_client.get_fte_groups(
+                wbs_l1, collection, labor=labor, institution=institution
+            )
+            totals = self.tc_data_adaptor.get_total_rows_from_fte_groups(
+                wbs_l1,
+                fte_groups,
+                only_totals_w_data=bool(labor or institution),
+                with_us_non_us=not institution,
+            )
+            for total in sorted(totals, key=self.tc_cache.sort_key):
+                self.write(json.dumps(total) + "\n")
 
     @service_account_auth(roles=[AUTH_SERVICE_ACCOUNT])  # type: ignore
     async def post(self, wbs_l1: str) -> None:
@@ -139,6 +295,84 @@ class TableHandler(BaseMoUHandler):  # pylint: disable=W0223
 # -----------------------------------------------------------------------------
 
 
+class TableTotalsHandler(BaseMoUHandler):  # pylint: disable=W0223
+    """Handle requests for a table's total rows, without the table itself."""
+
+    ROUTE = rf"/table/totals/(?P<wbs_l1>{_WBS_L1_REGEX_VALUES})$"
+
+    @service_account_auth(roles=[AUTH_SERVICE_ACCOUNT])  # type: ignore
+    async def get(self, wbs_l1: str) -> None:
+        """Handle GET."""
+        collection = self.get_argument("snapshot", "")
+
+        institution = self.get_argument("institution", default=None)
+        labor = self.get_argument("labor", default=None)
+
+        fte_groups = await self.mou_db_client.get_fte_groups(
+            wbs_l1, collection, labor=labor, institution=institution
+        )
+        totals = self.tc_data_adaptor.get_total_rows_from_fte_groups(
+            wbs_l1,
+            fte_groups,
+            only_totals_w_data=bool(labor or institution),
+            with_us_non_us=not institution,
+        )
+
+        # sort
+        totals.sort(key=self.tc_cache.sort_key)
+
+        self.write({"totals": totals})
+
+
+# -----------------------------------------------------------------------------
+
+
+class TableHistoryHandler(BaseMoUHandler):  # pylint: disable=W0223
+    """Handle requests for the live table's history (blame) over the snapshots."""
+
+    ROUTE = rf"/table/history/(?P<wbs_l1>{_WBS_L1_REGEX_VALUES})$"
+
+    @service_account_auth(roles=[AUTH_SERVICE_ACCOUNT])  # type: ignore
+    async def get(self, wbs_l1: str) -> None:
+        """Handle GET.
+
+        Each live record (most recently edited first) is compared with
+        its version in every snapshot (newest first), see
+        `utils.RecordHistories`. The snapshots are streamed, one at a time.
+        Records are compared with their on-the-fly fields, as they're served.
+        """
+        is_admin = self.get_argument("is_admin", type=bool, default=False)
+
+        snapshots = await self.mou_db_client.list_snapshot_infos(
+            wbs_l1, exclude_admin_snaps=not is_admin
+        )
+
+        table = await self.mou_db_client.get_table(wbs_l1)
+        for record in table:
+            self.tc_data_adaptor.add_on_the_fly_fields(record)
+        table.sort(key=lambda r: r[columns.TIMESTAMP], reverse=True)
+
+        async def with_on_the_fly_fields(
+            records: AsyncIterator[types.Record],
+        ) -> AsyncIterator[types.Record]:
+            async for rec in records:
+                yield self.tc_data_adaptor.add_on_the_fly_fields(rec)
+
+        histories = utils.RecordHistories(table)
+        for snap in snapshots:
+            await histories.add_snapshot(
+                snap["timestamp"],
+                with_on_the_fly_fields(
+                    self.mou_db_client.iter_table(wbs_l1, snap["timestamp"])
+                ),
+            )
+
+        self.write({"history": histories.get_histories(), "snapshots": snapshots})
+
+
+# -----------------------------------------------------------------------------
+
+
 class RecordHandler(BaseMoUHandler):  # pylint: disable=W0223
     """Handle requests for a record."""
 
@@ -177,6 +411,50 @@ class RecordHandler(BaseMoUHandler):  # pylint: disable=W0223
 # -----------------------------------------------------------------------------
 
 
+class RecordsHandler(BaseMoUHandler):  # pylint: disable=W0223
+    """Handle requests for many records at once."""
+
+    ROUTE = rf"/records/(?P<wbs_l1>{_WBS_L1_REGEX_VALUES})$"
+
+    @service_account_auth(roles=[AUTH_SERVICE_ACCOUNT])  # type: ignore
+    async def post(self, wbs_l1: str) -> None:
+        """Handle POST.
+
+        Each record either succeeds or fails on its own, so respond with
+        a result per record (in order): `{"record": ...}` or `{"error": ...}`.
+        """
+        records = self.get_argument("records", type=list)
+        editor = self.get_argument("editor")
+
+        results: List[Dict[str, Any]] = [
+            {} if isinstance(r, dict) else {"error": f"Record is not an object: {r!r}"}
+            for r in records
+        ]
+        upserts = await self.mou_db_client.upsert_records(
+            wbs_l1,
+            [
+                self.tc_data_adaptor.remove_on_the_fly_fields(r)
+                for r in records
+                if isinstance(r, dict)
+            ],
+            editor,
+        )
+
+        # fill in the valid records' results, in order
+        valid_results = [res for res in results if not res]
+        for (record, error), result in zip(upserts, valid_results):
+            if record is None:
+                result["error"] = error
+            else:
+                record = self.tc_data_adaptor.add_on_the_fly_fields(record)
+                result["record"] = record
+
+        self.write({"results": results})
+
+
+# -----------------------------------------------------------------------------
+
+
 class TableConfigHandler(BaseMoUHandler):  # pylint: disable=W0223
     """Handle requests for the table config dict."""
 
@@ -189,17 +467,19 @@ class TableConfigHandler(BaseMoUHandler):  # pylint: disable=W0223
         table_config = {
             l1: {
                 "columns": self.tc_cache.get_columns(),
-                "simple_dropdown_menus": self.tc_cache.get_simple_dropdown_menus(l1),
+                "simple_dropdown_menus": dict(
+                    self.tc_cache.get_simple_dropdown_menus(l1)
+                ),
                 "labor_categories": self.tc_cache.get_labor_categories_and_abbrevs(),
-                "conditional_dropdown_menus": self.tc_cache.get_conditional_dropdown_menus(
-                    l1
+                "conditional_dropdown_menus": dict(
+                    self.tc_cache.get_conditional_dropdown_menus(l1)
                 ),
                 "dropdowns": self.tc_cache.get_dropdowns(l1),
                 "numerics": self.tc_cache.get_numerics(),
                 "non_editables": self.tc_cache.get_non_editables(),
                 "hiddens": self.tc_cache.get_hiddens(),
-                "tooltips": self.tc_cache.get_tooltips(),
-                "widths": self.tc_cache.get_widths(),
+                "tooltips": dict(self.tc_cache.get_tooltips()),
+                "widths": dict(self.tc_cache.get_widths()),
                 "border_left_columns": self.tc_cache.get_border_left_columns(),
                 "page_size": self.tc_cache.get_page_size(),
             }
@@ -224,14 +504,9 @@ class SnapshotsHandler(BaseMoUHandler):  # pylint: disable=W0223
         """Handle GET."""
         is_admin = self.get_argument("is_admin", type=bool, default=False)
 
-        timestamps = await self.mou_db_client.list_snapshot_timestamps(
+        snapshots = await self.mou_db_client.list_snapshot_infos(
             wbs_l1, exclude_admin_snaps=not is_admin
         )
-        timestamps.sort(reverse=True)
-
-        snapshots = [
-            await self.mou_db_client.get_snapshot_info(wbs_l1, ts) for ts in timestamps
-        ]
 
         self.write({"snapshots": snapshots})
 
@@ -272,6 +547,17 @@ class InstitutionValuesHandler(BaseMoUHandler):  # pylint: disable=W0223
         institution = self.get_argument("institution")
         snapshot_timestamp = self.get_argument("snapshot_timestamp", "")
 
+        if snapshot_timestamp:  # snapshots are immutable
+            await self.write_snapshot_response(
+                wbs_l1,
+                snapshot_timestamp,
+                ("institution_values", wbs_l1, snapshot_timestamp, institution),
+                lambda: self.mou_db_client.get_institution_values(
+                    wbs_l1, snapshot_timestamp, institution
+                ),
+            )
+            return
+
         vals = await self.mou_db_client.get_institution_values(
             wbs_l1, snapshot_timestamp, institution
         )
@@ -317,6 +603,26 @@ class InstitutionValuesHandler(BaseMoUHandler):  # pylint: disable=W0223
 # -----------------------------------------------------------------------------
 
 
+class InstitutionValuesAllHandler(BaseMoUHandler):  # pylint: disable=W0223
+    """Handle requests for all the institutions' values, possibly for a snapshot."""
+
+    ROUTE = rf"/institution/values/(?P<wbs_l1>{_WBS_L1_REGEX_VALUES})/all$"
+
+    @service_account_auth(roles=[AUTH_SERVICE_ACCOUNT])  # type: ignore
+    async def get(self, wbs_l1: str) -> None:
+        """Handle GET."""
+        snapshot_timestamp = self.get_argument("snapshot_timestamp", "")
+
+        all_insts_values = await self.mou_db_client.get_all_institution_values(
+            wbs_l1, snapshot_timestamp
+        )
+
+        self.write(all_insts_values)
+
+
+# -----------------------------------------------------------------------------
+
+
 class InstitutionStaticHandler(BaseMoUHandler):  # pylint: disable=W0223
     """Handle requests for querying current-day info about the institutions."""
 
@@ -329,3 +635,17 @@ class InstitutionStaticHandler(BaseMoUHandler):  # pylint: disable=W0223
         vals = {i.short_name: asdict(i) for i in institutions}
 
         self.write(vals)
+
+
+# -----------------------------------------------------------------------------
+
+
+class MongoPoolMetricsHandler(BaseMoUHandler):  # pylint: disable=W0223
+    """Handle requests for the MongoDB connection-pool metrics."""
+
+    ROUTE = r"/metrics/mongo$"
+
+    @service_account_auth(roles=[AUTH_SERVICE_ACCOUNT])  # type: ignore
+    async def get(self) -> None:
+        """Handle GET."""
+        self.write(self.pool_metrics.get_summary())
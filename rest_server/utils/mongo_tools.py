@@ -1,9 +1,12 @@
 """General tools for interacting with a MongoDB."""
 
 import copy
-from typing import Any, Callable, Dict
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
 
 from bson.objectid import ObjectId  # type: ignore[import]
+from pymongo import monitoring  # type: ignore[import]
 
 from ..data_sources import columns
 
@@ -12,6 +15,94 @@ class DocumentNotFoundError(Exception):
     """Raised when a document is not found."""
 
 
+class ConnectionPoolMetrics(monitoring.ConnectionPoolListener):  # type: ignore[misc]
+    """Collect connection-pool metrics for a (shared) MongoDB client.
+
+    Pass an instance to the client via `event_listeners`. Events for a
+    single check-out are published in the thread that requests the
+    connection, so the wait time is tracked thread-locally.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checked_out = 0  # currently checked out
+        self.max_checked_out = 0
+        self.n_checkouts = 0
+        self.n_failed_checkouts = 0
+        self.total_wait_secs = 0.0
+        self.max_wait_secs = 0.0
+
+    def _stop_wait_timer(self) -> float:
+        start = getattr(self._local, "start", None)
+        self._local.start = None
+        if start is None:
+            return 0.0
+        return time.monotonic() - start
+
+    def connection_check_out_started(self, event: Any) -> None:
+        """Start the wait timer."""
+        self._local.start = time.monotonic()
+
+    def connection_checked_out(self, event: Any) -> None:
+        """Stop the wait timer and count the connection as checked out."""
+        wait = self._stop_wait_timer()
+        with self._lock:
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.n_checkouts += 1
+            self.total_wait_secs += wait
+            self.max_wait_secs = max(self.max_wait_secs, wait)
+
+    def connection_check_out_failed(self, event: Any) -> None:
+        """Stop the wait timer and count the failure."""
+        wait = self._stop_wait_timer()
+        with self._lock:
+            self.n_failed_checkouts += 1
+            self.total_wait_secs += wait
+            self.max_wait_secs = max(self.max_wait_secs, wait)
+
+    def connection_checked_in(self, event: Any) -> None:
+        """Count the connection as returned to the pool."""
+        with self._lock:
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def pool_created(self, event: Any) -> None:
+        """Ignore."""
+
+    def pool_ready(self, event: Any) -> None:
+        """Ignore."""
+
+    def pool_cleared(self, event: Any) -> None:
+        """Ignore."""
+
+    def pool_closed(self, event: Any) -> None:
+        """Ignore."""
+
+    def connection_created(self, event: Any) -> None:
+        """Ignore."""
+
+    def connection_ready(self, event: Any) -> None:
+        """Ignore."""
+
+    def connection_closed(self, event: Any) -> None:
+        """Ignore."""
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Get a snapshot of the metrics."""
+        with self._lock:
+            n_attempts = self.n_checkouts + self.n_failed_checkouts
+            avg_wait = self.total_wait_secs / n_attempts if n_attempts else 0.0
+            return {
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "n_checkouts": self.n_checkouts,
+                "n_failed_checkouts": self.n_failed_checkouts,
+                "avg_wait_secs": avg_wait,
+                "max_wait_secs": self.max_wait_secs,
+            }
+
+
 class Mongofier:
     """Tools for moving/transforming data in/out of a MongoDB."""
 
@@ -51,11 +142,36 @@ class Mongofier:
 
         return dicto
 
+    @staticmethod
+    def _transform_flat_doc(
+        doc_in: Dict[str, Any],
+        key_names: Dict[str, str],
+        key_func: Callable[[str], str],
+        no_nones: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """Change every key, in one pass, AS A COPY.
+
+        Return None if the doc isn't flat (has a nested dict/list).
+        Values are not copied, since they are all immutable scalars.
+        """
+        doc = {}
+        for key, val in doc_in.items():
+            if isinstance(val, (dict, list)):
+                return None
+            if no_nones and val is None:
+                val = ""
+            doc[key_names.get(key) or key_func(key)] = val
+        return doc
+
     @staticmethod
     def mongofy_document(doc_in: Dict[str, Any]) -> Dict[str, Any]:
         """Transform doc to mongo-friendly, recursively, AS A COPY."""
-        doc = copy.deepcopy(doc_in)
-        doc = Mongofier._mongofy_every_key(doc)
+        doc = Mongofier._transform_flat_doc(
+            doc_in, _MONGOFIED_COLUMNS, Mongofier.mongofy_key_name
+        )
+        if doc is None:  # nested
+            doc = copy.deepcopy(doc_in)
+            doc = Mongofier._mongofy_every_key(doc)
 
         if doc.get(columns.ID):
             doc[columns.ID] = ObjectId(doc[columns.ID])  # cast ID
@@ -67,22 +183,36 @@ class Mongofier:
         doc_in: Dict[str, Any], str_id: bool = True
     ) -> Dict[str, Any]:
         """Transform doc to human-friendly, recursively, AS A COPY."""
-        doc = copy.deepcopy(doc_in)
-
-        def no_nones(dicto: Dict[str, Any]) -> Dict[str, Any]:
-            """Recursively replace `None`s with ''."""
-            for key in dicto.keys():
-                if dicto[key] is None:
-                    dicto[key] = ""
-            # recurse over sub-dicts
-            for key, val in list(dicto.items()):
-                if isinstance(val, dict):
-                    dicto[key] = no_nones(val)
-            return dicto
-
-        doc = no_nones(doc)
-        doc = Mongofier._demongofy_every_key(doc)
+        doc = Mongofier._transform_flat_doc(
+            doc_in, _DEMONGOFIED_COLUMNS, Mongofier.demongofy_key_name, no_nones=True
+        )
+        if doc is None:  # nested
+            doc = copy.deepcopy(doc_in)
+
+            def no_nones(dicto: Dict[str, Any]) -> Dict[str, Any]:
+                """Recursively replace `None`s with ''."""
+                for key in dicto.keys():
+                    if dicto[key] is None:
+                        dicto[key] = ""
+                # recurse over sub-dicts
+                for key, val in list(dicto.items()):
+                    if isinstance(val, dict):
+                        dicto[key] = no_nones(val)
+                return dicto
+
+            doc = no_nones(doc)
+            doc = Mongofier._demongofy_every_key(doc)
+
         if str_id:
             doc[columns.ID] = str(doc[columns.ID])  # cast ID
 
         return doc
+
+
+# the columns' key names are known ahead of time, so only transform them once
+_MONGOFIED_COLUMNS: Dict[str, str] = {
+    col: Mongofier.mongofy_key_name(col)
+    for name, col in vars(columns).items()
+    if name.isupper() and isinstance(col, str)
+}
+_DEMONGOFIED_COLUMNS: Dict[str, str] = {v: k for k, v in _MONGOFIED_COLUMNS.items()}
@@ -42,3 +42,29 @@ class SupplementalDoc(TypedDict):
     creator: str
     snapshot_institution_values: Dict[str, InstitutionValues]
     admin_only: bool
+    delta_base: str  # "" for a full snapshot (absent in legacy documents)
+
+
+class SnapshotCatalogDoc(TypedDict):
+    """Fields for a snapshot's document in the (per-WBS) snapshot catalog."""
+
+    timestamp: str
+    name: str
+    creator: str
+    admin_only: bool
+    n_records: int
+    size: int  # bytes, of the snapshot's own collection
+
+
+class RecordHistory(TypedDict):
+    """A live record's history over the snapshots.
+
+    Not a mongo schema. For REST calls.
+    """
+
+    record: Record
+    # {<field>: {"today"|<snap_ts>: <value>}}, empty if the field never changed
+    field_changes: Dict[str, Dict[str, DataEntry]]
+    brand_new: bool  # not in any snapshot
+    never_changed: bool
+    oldest_snapshot: str  # the oldest snapshot with an unchanged field
@@ -1,13 +1,34 @@
 """Utility functions for the REST server interface."""
 
+import itertools
+import time
+from collections import OrderedDict, defaultdict
 from decimal import Decimal
-from typing import cast
+from typing import (
+    Any,
+    AsyncIterator,
+    DefaultDict,
+    Dict,
+    Final,
+    Generic,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 from ..data_sources import columns, table_config_cache
 from . import types
 from .mongo_tools import Mongofier
 
 
+_FTEBuckets = DefaultDict[Tuple[Any, ...], Decimal]
+_K = TypeVar("_K")
+_V = TypeVar("_V")
+
+
 class TableConfigDataAdaptor:
     """Augments a record/table using a `TableConfigCache` instance."""
 
@@ -16,8 +37,9 @@ class TableConfigDataAdaptor:
 
     def remove_on_the_fly_fields(self, record: types.Record) -> types.Record:
         """Remove (del) any fields that are only to be calculated on-the-fly."""
+        on_the_fly_fields = self.tc_cache.get_on_the_fly_fields()
         for field in record.copy().keys():
-            if field in self.tc_cache.get_on_the_fly_fields():
+            if field in on_the_fly_fields:
                 # copy over grand total to FTE
                 if (field == columns.GRAND_TOTAL) and (
                     columns.FTE not in record.keys()
@@ -70,27 +92,81 @@ class TableConfigDataAdaptor:
         Returns:
             types.Table -- a new table of rows with totals
         """
+        buckets: _FTEBuckets = defaultdict(Decimal)
+        for record in table:
+            self._bucket_fte(buckets, record)
+
+        return self._get_total_rows_from_buckets(
+            wbs_l1, buckets, only_totals_w_data, with_us_non_us
+        )
+
+    def get_total_rows_from_fte_groups(
+        self,
+        wbs_l1: str,
+        fte_groups: List[Tuple[types.Record, int]],
+        only_totals_w_data: bool = False,
+        with_us_non_us: bool = True,
+    ) -> types.Table:
+        """Calculate rows with totals of each category (cascadingly).
+
+        Like `get_total_rows()`, but from pre-grouped records, see
+        `MoUDatabaseClient.get_fte_groups()`.
+
+        Arguments:
+            fte_groups {List[Tuple[types.Record, int]]} -- partial records, each w/ its number of occurrences
+
+        Returns:
+            types.Table -- a new table of rows with totals
+        """
+        buckets: _FTEBuckets = defaultdict(Decimal)
+        for record, n_records in fte_groups:
+            self._bucket_fte(buckets, self.add_on_the_fly_fields(record), n_records)
+
+        return self._get_total_rows_from_buckets(
+            wbs_l1, buckets, only_totals_w_data, with_us_non_us
+        )
+
+    @staticmethod
+    def _bucket_fte(
+        buckets: _FTEBuckets, record: types.Record, n_records: int = 1
+    ) -> None:
+        """Add the record's FTE to its bucket, keyed by its category values."""
+        if (
+            not record
+            or columns.TOTAL_COL in record.keys()  # skip any total rows
+            or not record[columns.FTE]  # skip blanks (also 0s)
+        ):
+            return
+        key = (
+            record.get(columns.WBS_L2),
+            record.get(columns.WBS_L3),
+            record.get(columns.SOURCE_OF_FUNDS_US_ONLY),
+            record.get(columns.US_NON_US),
+        )
+        # avoid floating point loss
+        buckets[key] += Decimal(str(record[columns.FTE])) * n_records
+
+    def _get_total_rows_from_buckets(  # pylint: disable=R0914
+        self,
+        wbs_l1: str,
+        buckets: _FTEBuckets,
+        only_totals_w_data: bool,
+        with_us_non_us: bool,
+    ) -> types.Table:
         totals: types.Table = []
 
+        # roll up each bucket into every total it's a part of ("" matches any value)
+        rollups: DefaultDict[Tuple[Any, ...], Decimal] = defaultdict(Decimal)
+        for (l2, l3, fund_src, region), fte in buckets.items():
+            for rollup_key in set(
+                itertools.product((l2, ""), (l3, ""), (fund_src, ""), (region, ""))
+            ):
+                rollups[rollup_key] += fte
+
         def grab_a_total(  # pylint: disable=C0103
             l2: str = "", l3: str = "", fund_src: str = "", region: str = ""
         ) -> float:
-            return float(
-                sum(
-                    Decimal(str(r[columns.FTE]))  # avoid floating point loss
-                    for r in table
-                    if r
-                    and columns.TOTAL_COL not in r.keys()  # skip any total rows
-                    and r[columns.FTE]  # skip blanks (also 0s)
-                    and (not l2 or r[columns.WBS_L2] == l2)
-                    and (not l3 or r[columns.WBS_L3] == l3)
-                    and (
-                        not fund_src
-                        or r.get(columns.SOURCE_OF_FUNDS_US_ONLY) == fund_src
-                    )
-                    and (not region or r.get(columns.US_NON_US) == region)
-                )
-            )
+            return float(rollups.get((l2, l3, fund_src, region), Decimal()))
 
         for l2_cat in self.tc_cache.get_l2_categories(wbs_l1):
 
@@ -272,3 +348,134 @@ class MoUDataAdaptor:
             record.pop(MoUDataAdaptor.IS_DELETED)
 
         return record
+
+
+class LRUCache(Generic[_K, _V]):
+    """A dict-like cache that evicts the least-recently used item(s).
+
+    With `max_age` (seconds), an item also expires that long after it
+    was put.
+    """
+
+    def __init__(self, maxsize: int, max_age: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self._items: "OrderedDict[_K, Tuple[float, _V]]" = OrderedDict()
+
+    def _is_expired(self, key: _K) -> bool:
+        if self.max_age is None:
+            return False
+        put_at, _ = self._items[key]
+        return time.time() - put_at >= self.max_age
+
+    def __contains__(self, key: _K) -> bool:
+        return key in self._items and not self._is_expired(key)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: _K) -> Optional[_V]:
+        """Get the item (and mark it as recently used), or None."""
+        if key not in self._items:
+            return None
+        if self._is_expired(key):
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return self._items[key][1]
+
+    def put(self, key: _K, value: _V) -> None:
+        """Add/replace the item, then evict the least-recently used items."""
+        self._items[key] = (time.time(), value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def pop(self, key: _K) -> None:
+        """Remove the item, if it's there."""
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all the items."""
+        self._items.clear()
+
+
+HISTORY_CURRENT: Final[str] = "today"  # the key for a field's live value
+HISTORY_NA: Final[str] = "n/a"  # the value for a field not in the snapshot
+# on-the-fly fields that only mirror another field's history
+_HISTORY_SKIPPED_FIELDS: Final[List[str]] = ["", columns.GRAND_TOTAL, columns.US_NON_US]
+
+
+class RecordHistories:
+    """The live records' histories over the snapshots, where they differ.
+
+    Fold in the snapshots newest first, one at a time, with
+    `add_snapshot()`. Only the live records and their histories are held
+    in memory, never a whole snapshot.
+    """
+
+    def __init__(self, table: types.Table) -> None:
+        self._histories: Dict[str, types.RecordHistory] = {
+            cast(str, r[columns.ID]): {
+                "record": r,
+                "field_changes": {k: {HISTORY_CURRENT: r[k]} for k in r},
+                "brand_new": True,
+                "never_changed": True,
+                "oldest_snapshot": "",
+            }
+            for r in table
+        }
+
+    async def add_snapshot(
+        self, snap_ts: str, snap_records: AsyncIterator[types.Record]
+    ) -> None:
+        """Compare each live record with its version in the snapshot."""
+        in_snap: Set[str] = set()
+        async for snap_record in snap_records:
+            record_id = cast(str, snap_record[columns.ID])
+            if history := self._histories.get(record_id):
+                in_snap.add(record_id)
+                self._add_snapshot_record(history, snap_ts, snap_record)
+
+        for record_id, history in self._histories.items():
+            if record_id not in in_snap:
+                self._add_snapshot_record(history, snap_ts, None)
+
+    @staticmethod
+    def _add_snapshot_record(
+        history: types.RecordHistory,
+        snap_ts: str,
+        snap_record: Optional[types.Record],
+    ) -> None:
+        """Compare the record with its version in a snapshot (None if absent)."""
+        if snap_record is not None:
+            history["brand_new"] = False
+        record = history["record"]
+        for field in record:
+            if field in _HISTORY_SKIPPED_FIELDS:
+                continue
+            if (snap_record is None) or (field not in snap_record):
+                history["field_changes"][field][snap_ts] = HISTORY_NA
+            elif snap_record[field] != record[field]:
+                history["field_changes"][field][snap_ts] = snap_record[field]
+                history["never_changed"] = False
+            else:
+                history["oldest_snapshot"] = snap_ts
+
+    def get_histories(self) -> List[types.RecordHistory]:
+        """Get the histories, in the live table's order.
+
+        A field's values are only kept if they ever changed.
+        """
+        histories = []
+        for history in self._histories.values():
+            field_changes = {}
+            for field, changes in history["field_changes"].items():
+                # throw out fields that have never changed, or were only ever NA
+                if len(set(changes.values())) < 2 or all(
+                    v == HISTORY_NA for v in list(changes.values())[1:]
+                ):
+                    changes = {}
+                field_changes[field] = changes
+            histories.append(dict(history, field_changes=field_changes))
+        return cast(List[types.RecordHistory], histories)
@@ -10,12 +10,15 @@ NOTE: THESE TESTS NEED TO RUN IN ORDER -- STATE DEPENDENT
 import base64
 import sys
 import time
+from typing import Any, Dict, List, Tuple
 
+import pymongo  # type: ignore[import]
 import pytest
 import requests
 
 # local imports
 from rest_tools.client import RestClient  # type: ignore
+from wipac_dev_tools import from_environment  # type: ignore[import]
 
 sys.path.append(".")
 from rest_server import routes  # isort:skip  # noqa # pylint: disable=E0401,C0413
@@ -24,6 +27,7 @@ from rest_server.utils import (  # isort:skip  # noqa # pylint: disable=E0401,C0
     types,
 )
 from rest_server.data_sources import (  # isort:skip  # noqa # pylint: disable=E0401,C0413
+    mou_db,
     todays_institutions,
 )
 
@@ -203,6 +207,23 @@ class TestNoArgumentRoutes:
             assert all(s[0].isupper() for s in inst.split("-"))
             todays_institutions.Institution(**info)  # try to cast it (atrrs & types)
 
+    @staticmethod
+    def test_mongo_pool_metrics_get(ds_rc: RestClient) -> None:
+        """Test `GET` @ `/metrics/mongo`."""
+        assert routes.MongoPoolMetricsHandler.ROUTE == r"/metrics/mongo$"
+        assert "get" in dir(routes.MongoPoolMetricsHandler)
+
+        resp = ds_rc.request_seq("GET", "/metrics/mongo")
+        assert list(resp.keys()) == [
+            "checked_out",
+            "max_checked_out",
+            "n_checkouts",
+            "n_failed_checkouts",
+            "avg_wait_secs",
+            "max_wait_secs",
+        ]
+        assert resp["n_checkouts"]  # test_ingest() already used the pool
+
 
 class TestTableHandler:
     """Test `/table/data`."""
@@ -279,6 +300,93 @@ class TestTableHandler:
             for record in resp["table"]:
                 self._assert_schema(record)
 
+    @staticmethod
+    def test_get_fields(ds_rc: RestClient) -> None:
+        """Test `GET` @ `/table/data` with `fields`."""
+        fields = ["Institution", "WBS L2", "FTE"]
+        full = ds_rc.request_seq("GET", f"/table/data/{WBS_L1}")["table"]
+        resp = ds_rc.request_seq("GET", f"/table/data/{WBS_L1}", {"fields": fields})
+
+        assert len(resp["table"]) == len(full)
+        full_by_id = {r["_id"]: r for r in full}
+        for record in resp["table"]:
+            assert set(record.keys()) <= set(fields) | {"_id"}
+            assert record == {k: full_by_id[record["_id"]][k] for k in record}
+
+    @staticmethod
+    def test_get_stream(ds_rc: RestClient) -> None:
+        """Test `GET` @ `/table/data` with `stream`."""
+        all_args: List[Dict[str, Any]] = [
+            {},
+            {"institution": "UW-Madison"},
+            {"total_rows": True},
+        ]
+        for args in all_args:
+            resp = ds_rc.request_seq("GET", f"/table/data/{WBS_L1}", args)
+            streamed = list(
+                ds_rc.request_stream(
+                    "GET", f"/table/data/{WBS_L1}", dict(args, stream=True)
+                )
+            )
+            # same records, but not sorted
+            assert sorted(streamed, key=str) == sorted(resp["table"], key=str)
+
+    @staticmethod
+    def test_get_snapshot_etag(ds_rc: RestClient) -> None:
+        """Test `GET` @ `/table/data` for a snapshot, with `If-None-Match`."""
+        snaps = ds_rc.request_seq("GET", f"/snapshots/list/{WBS_L1}")["snapshots"]
+        url = f"http://localhost:8080/table/data/{WBS_L1}"
+        body = {"snapshot": snaps[0]["timestamp"], "total_rows": True}
+
+        first = requests.get(url, json=body)
+        first.raise_for_status()
+        etag = first.headers["Etag"]
+        assert not etag.startswith("W/")  # strong
+
+        # cached -- same response
+        again = requests.get(url, json=body)
+        assert again.headers["Etag"] == etag
+        assert again.json() == first.json()
+        assert first.json() == ds_rc.request_seq("GET", f"/table/data/{WBS_L1}", body)
+
+        # not modified
+        resp = requests.get(url, json=body, headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert not resp.content
+
+        # a different response
+        other = requests.get(url, json=dict(body, institution="UW-Madison"))
+        assert other.headers["Etag"] != etag
+
+        # not a (complete) snapshot
+        resp = requests.get(url, json=dict(body, snapshot="123.45"))
+        assert resp.status_code == 404
+
+
+class TestTableTotalsHandler:
+    """Test `/table/totals`."""
+
+    @staticmethod
+    def test_sanity() -> None:
+        """Check routes and methods are there."""
+        assert (
+            routes.TableTotalsHandler.ROUTE
+            == rf"/table/totals/(?P<wbs_l1>{routes._WBS_L1_REGEX_VALUES})$"
+        )
+        assert "get" in dir(routes.TableTotalsHandler)
+
+    @staticmethod
+    def test_get(ds_rc: RestClient) -> None:
+        """Test `GET` @ `/table/totals` against `GET` @ `/table/data`."""
+        for body in [{}, {"institution": "UW-Madison"}, {"labor": "KE"}]:
+            resp = ds_rc.request_seq(
+                "GET", f"/table/data/{WBS_L1}", dict(body, total_rows=True)
+            )
+            total_rows = [r for r in resp["table"] if "Total-Row Description" in r]
+
+            resp = ds_rc.request_seq("GET", f"/table/totals/{WBS_L1}", body)
+            assert resp["totals"] == total_rows
+
 
 class TestRecordHandler:
     """Test `/record`."""
@@ -323,3 +431,240 @@ class TestRecordHandler:
 
         with pytest.raises(requests.exceptions.HTTPError):
             _ = ds_rc.request_seq("DELETE", f"/record/{WBS_L1}")
+
+
+class TestRecordsHandler:
+    """Test `/records`."""
+
+    @staticmethod
+    def test_sanity() -> None:
+        """Check routes and methods are there."""
+        assert (
+            routes.RecordsHandler.ROUTE
+            == rf"/records/(?P<wbs_l1>{routes._WBS_L1_REGEX_VALUES})$"
+        )
+        assert "post" in dir(routes.RecordsHandler)
+
+    @staticmethod
+    def test_post(ds_rc: RestClient) -> None:
+        """Test `POST` @ `/records`."""
+        table = ds_rc.request_seq("GET", f"/table/data/{WBS_L1}")["table"]
+
+        # two changed, one new, one invalid
+        records = [dict(r, **{"Task Description": "bulk edit"}) for r in table[:2]]
+        records.append({k: v for k, v in table[2].items() if k != "_id"})
+        records.append(dict(table[3], **{"Labor Cat.": "not a labor category"}))
+        resp = ds_rc.request_seq(
+            "POST", f"/records/{WBS_L1}", {"records": records, "editor": "Hank"}
+        )
+
+        results = resp["results"]
+        assert len(results) == 4
+        for result, record in zip(results[:2], records[:2]):
+            assert result["record"]["_id"] == record["_id"]
+            assert result["record"]["Task Description"] == "bulk edit"
+            assert result["record"]["Name of Last Editor"] == "Hank"
+        assert results[2]["record"]["_id"] not in [r["_id"] for r in table]
+        assert list(results[3].keys()) == ["error"]
+
+        # the valid ones were written
+        after = ds_rc.request_seq("GET", f"/table/data/{WBS_L1}")["table"]
+        assert len(after) == len(table) + 1
+        after_by_id = {r["_id"]: r for r in after}
+        for result in results[:3]:
+            assert after_by_id[result["record"]["_id"]] == result["record"]
+        assert after_by_id[table[3]["_id"]] == table[3]
+
+        # records that aren't objects fail on their own
+        resp = ds_rc.request_seq(
+            "POST", f"/records/{WBS_L1}", {"records": [None, "foo"], "editor": "Hank"}
+        )
+        assert [list(r.keys()) for r in resp["results"]] == [["error"], ["error"]]
+
+        # bad args
+        with pytest.raises(requests.exceptions.HTTPError):
+            ds_rc.request_seq("POST", f"/records/{WBS_L1}", {"editor": "Hank"})
+
+
+class TestInstitutionValuesHandler:
+    """Test `/institution/values`."""
+
+    @staticmethod
+    def test_sanity() -> None:
+        """Check routes and methods are there."""
+        assert (
+            routes.InstitutionValuesHandler.ROUTE
+            == rf"/institution/values/(?P<wbs_l1>{routes._WBS_L1_REGEX_VALUES})$"
+        )
+        assert "get" in dir(routes.InstitutionValuesHandler)
+        assert "post" in dir(routes.InstitutionValuesHandler)
+
+    @staticmethod
+    def test_confirmed_reset_by_snapshot(ds_rc: RestClient) -> None:
+        """Test a snapshot keeps the confirmations, but resets the live ones."""
+        url = f"/institution/values/{WBS_L1}"
+        insts = ["UW-Madison", "Alabama"]
+        for inst in insts:
+            body = {
+                "institution": inst,
+                "phds_authors": 3,
+                "headcounts_confirmed": True,
+                "computing_confirmed": True,
+            }
+            ds_rc.request_seq("POST", url, body)
+            vals = ds_rc.request_seq("GET", url, {"institution": inst})
+            assert vals["headcounts_confirmed"] and vals["computing_confirmed"]
+
+        snap = ds_rc.request_seq(
+            "POST", f"/snapshots/make/{WBS_L1}", {"name": "reset", "creator": "Hank"}
+        )
+
+        for inst in insts:
+            vals = ds_rc.request_seq("GET", url, {"institution": inst})
+            assert not vals["headcounts_confirmed"]
+            assert not vals["computing_confirmed"]
+            assert vals["phds_authors"] == 3  # untouched
+            body = {"institution": inst, "snapshot_timestamp": snap["timestamp"]}
+            snap_vals = ds_rc.request_seq("GET", url, body)
+            assert snap_vals["headcounts_confirmed"]
+            assert snap_vals["computing_confirmed"]
+
+    @staticmethod
+    def test_get_snapshot_etag(ds_rc: RestClient) -> None:
+        """Test `GET` @ `/institution/values` for a snapshot, with `If-None-Match`."""
+        snaps = ds_rc.request_seq("GET", f"/snapshots/list/{WBS_L1}")["snapshots"]
+        url = f"http://localhost:8080/institution/values/{WBS_L1}"
+        body = {
+            "institution": "UW-Madison",
+            "snapshot_timestamp": snaps[0]["timestamp"],
+        }
+
+        first = requests.get(url, json=body)
+        first.raise_for_status()
+        etag = first.headers["Etag"]
+        assert first.json() == ds_rc.request_seq(
+            "GET", f"/institution/values/{WBS_L1}", body
+        )
+
+        resp = requests.get(url, json=body, headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+
+        # not a (complete) snapshot
+        resp = requests.get(url, json=dict(body, snapshot_timestamp="123.45"))
+        assert resp.status_code == 404
+
+    @staticmethod
+    def test_get_all(ds_rc: RestClient) -> None:
+        """Test `GET` @ `/institution/values/<wbs>/all`."""
+        assert (
+            routes.InstitutionValuesAllHandler.ROUTE
+            == rf"/institution/values/(?P<wbs_l1>{routes._WBS_L1_REGEX_VALUES})/all$"
+        )
+
+        all_vals = ds_rc.request_seq("GET", f"/institution/values/{WBS_L1}/all")
+        assert {"UW-Madison", "Alabama"} <= set(all_vals.keys())
+        for inst, vals in all_vals.items():
+            assert vals == ds_rc.request_seq(
+                "GET", f"/institution/values/{WBS_L1}", {"institution": inst}
+            )
+
+
+class TestTableHistoryHandler:
+    """Test `/table/history`."""
+
+    @staticmethod
+    def test_sanity() -> None:
+        """Check routes and methods are there."""
+        assert (
+            routes.TableHistoryHandler.ROUTE
+            == rf"/table/history/(?P<wbs_l1>{routes._WBS_L1_REGEX_VALUES})$"
+        )
+        assert "get" in dir(routes.TableHistoryHandler)
+
+    @staticmethod
+    def test_get(ds_rc: RestClient) -> None:
+        """Test `GET` @ `/table/history`."""
+        table = ds_rc.request_seq("GET", f"/table/data/{WBS_L1}")["table"]
+        resp = ds_rc.request_seq("GET", f"/table/history/{WBS_L1}", {"is_admin": True})
+
+        snapshots = ds_rc.request_seq(
+            "GET", f"/snapshots/list/{WBS_L1}", {"is_admin": True}
+        )["snapshots"]
+        assert resp["snapshots"] == snapshots
+
+        history = resp["history"]
+        assert sorted(h["record"]["_id"] for h in history) == sorted(
+            r["_id"] for r in table
+        )
+        timestamps = [h["record"]["Date & Time of Last Edit"] for h in history]
+        assert timestamps == sorted(timestamps, reverse=True)
+        snap_tss = {s["timestamp"] for s in snapshots}
+        for hist in history:
+            assert set(hist["field_changes"].keys()) == set(hist["record"].keys())
+            for changes in hist["field_changes"].values():
+                assert set(changes.keys()) <= snap_tss | {"today"}
+            if hist["brand_new"]:
+                assert not any(hist["field_changes"].values())
+
+
+class TestIndexes:
+    """Test the database's indexes, directly."""
+
+    @staticmethod
+    def _walk_plan(plan: Any) -> Tuple[List[str], List[str]]:
+        """Get all the stages & index names in the (nested) query plan."""
+        stages, index_names = [], []
+        if isinstance(plan, dict):
+            if "stage" in plan:
+                stages.append(plan["stage"])
+            if "indexName" in plan:
+                index_names.append(plan["indexName"])
+            plan = list(plan.values())
+        if isinstance(plan, list):
+            for sub in plan:
+                sub_stages, sub_index_names = TestIndexes._walk_plan(sub)
+                stages.extend(sub_stages)
+                index_names.extend(sub_index_names)
+        return stages, index_names
+
+    def test_table_queries_use_indexes(self) -> None:
+        """Test the table's read queries are served by indexes, via `explain()`."""
+        config_env = from_environment(config.DEFAULT_ENV_CONFIG)
+        mongo = pymongo.MongoClient(
+            f"mongodb://{config_env['MOU_MONGODB_HOST']}:{config_env['MOU_MONGODB_PORT']}"
+        )
+        coll = mongo[WBS_L1][mou_db._LIVE_COLLECTION]
+
+        specs = {s.name: s for s in mou_db.INDEX_SPECS["live"]}
+        assert {i["name"] for i in coll.list_indexes()} == set(specs) | {"_id_"}
+
+        # filtered
+        for labor, institution, index_name in [
+            ("KE", "UW-Madison", "institution_labor_deleted"),
+            ("", "UW-Madison", "institution_labor_deleted"),
+            ("KE", "", "labor_not_deleted"),
+        ]:
+            query = mou_db.MoUDatabaseClient._get_table_query(labor, institution)
+            stages, index_names = self._walk_plan(coll.find(query).explain())
+            assert "COLLSCAN" not in stages
+            assert index_name in index_names
+
+    @staticmethod
+    def test_snapshot_catalog() -> None:
+        """Test the snapshot catalog has every snapshot, and is indexed."""
+        config_env = from_environment(config.DEFAULT_ENV_CONFIG)
+        mongo = pymongo.MongoClient(
+            f"mongodb://{config_env['MOU_MONGODB_HOST']}:{config_env['MOU_MONGODB_PORT']}"
+        )
+        catalog = mongo[f"{WBS_L1}-supplemental"][mou_db._SNAPSHOT_CATALOG]
+
+        assert {i["name"] for i in catalog.list_indexes()} == {"timestamp", "_id_"}
+
+        snap_colls = set(mongo[WBS_L1].list_collection_names()) - {
+            mou_db._LIVE_COLLECTION
+        }
+        docs = list(catalog.find())
+        assert {d["timestamp"] for d in docs} == snap_colls
+        for doc in docs:
+            assert doc["n_records"] > 0
+            assert doc["size"] > 0
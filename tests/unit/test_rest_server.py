@@ -4,16 +4,19 @@
 
 
 import copy
+import inspect
 import pprint
 import sys
 import time
+from collections import Counter
 from decimal import Decimal
-from typing import Any, Final, List
-from unittest.mock import ANY, AsyncMock, Mock, patch, sentinel
+from typing import Any, Final, List, cast
+from unittest.mock import ANY, AsyncMock, MagicMock, Mock, patch, sentinel
 
 import nest_asyncio  # type: ignore[import]
 import pytest
 from bson.objectid import ObjectId  # type: ignore[import]
+from tornado import web
 
 from .. import institution_list
 from . import data
@@ -30,6 +33,7 @@ from rest_server.data_sources import (  # isort:skip  # noqa # pylint: disable=E
     columns,
 )
 from rest_server import config  # isort:skip  # noqa # pylint: disable=E0401,C0413,C0411
+from rest_server import routes  # isort:skip  # noqa # pylint: disable=E0401,C0413,C0411
 
 
 nest_asyncio.apply()  # allows nested event loops
@@ -65,7 +69,7 @@ class TestMoUDB:  # pylint: disable=R0904
     @pytest.mark.asyncio
     @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
     @patch(KRS_TOKEN, return_value=Mock())
-    @patch(MOU_DB_CLIENT + "._ensure_all_db_indexes")
+    @patch(MOU_DB_CLIENT + ".ensure_all_db_indexes")
     async def test_init(mock_eadi: Any, _: Any, __: Any) -> None:
         """Test MoUDatabaseClient.__init__()."""
         # Setup & Mock
@@ -113,9 +117,798 @@ class TestMoUDB:  # pylint: disable=R0904
         assert ret == dbs[:3]
         assert mock_mongo.list_database_names.side_effect.await_count == 1
 
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    @patch("rest_server.data_sources.mou_db.COLLECTION_NAMES_CACHE_AGE", 1)
+    async def test_list_collection_names(_: Any, __: Any) -> None:
+        """Test _list_collection_names() caching & invalidation."""
+        # Setup & Mock
+        mock_mongo = Mock()  # pylint:disable=redefined-outer-name
+        colls = ["LIVE_COLLECTION", "123.45"] + config.EXCLUDE_COLLECTIONS
+        mock_lcn = AsyncMock(return_value=colls)
+        mock_mongo.__getitem__ = Mock(return_value=Mock(list_collection_names=mock_lcn))
+        mou_db_client = mou_db.MoUDatabaseClient(
+            mock_mongo,
+            utils.MoUDataAdaptor(await tcc.TableConfigCache.create()),
+        )
+
+        # Call #1 & #2 -- only one query
+        assert await mou_db_client._list_collection_names(WBS) == colls[:2]
+        assert await mou_db_client._list_collection_names(WBS) == colls[:2]
+        assert mock_lcn.await_count == 1
+
+        # Call #3 -- after invalidation
+        mou_db_client._invalidate_collection_names(WBS)
+        assert await mou_db_client._list_collection_names(WBS) == colls[:2]
+        assert mock_lcn.await_count == 2
+
+        # Call #4 -- after cache time limit
+        time.sleep(1)
+        assert await mou_db_client._list_collection_names(WBS) == colls[:2]
+        assert mock_lcn.await_count == 3
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    @patch(MOU_DB_CLIENT + "._list_collection_names")
+    @patch(MOU_DB_CLIENT + "._list_database_names")
+    async def test_ensure_indexes_once(
+        mock_ldn: Any, mock_lcn: Any, _: Any, __: Any, mock_mongo: Any
+    ) -> None:
+        """Test ensure_all_db_indexes() & _ensure_collection_indexed_once()."""
+        # Setup & Mock
+        mou_db_client = mou_db.MoUDatabaseClient(
+            mock_mongo,
+            utils.MoUDataAdaptor(await tcc.TableConfigCache.create()),
+        )
+        mock_ldn.side_effect = AsyncMock(return_value=["mo"])
+        mock_lcn.side_effect = AsyncMock(return_value=["LIVE_COLLECTION", "123.45"])
+        ensured: List[Any] = []
+
+        async def _fake_ensure(wbs_db: str, snap_coll: str) -> None:
+            ensured.append((wbs_db, snap_coll))
+            mou_db_client._indexed_colls.add((wbs_db, snap_coll))
+
+        mou_db_client._ensure_collection_indexes = _fake_ensure  # type: ignore
+
+        # Call -- startup
+        await mou_db_client.ensure_all_db_indexes()
+        assert ensured == [("mo", "LIVE_COLLECTION"), ("mo", "123.45")]
+
+        # Call -- again, and per-read: no re-indexing
+        await mou_db_client.ensure_all_db_indexes()
+        await mou_db_client._ensure_collection_indexed_once("mo", "LIVE_COLLECTION")
+        assert len(ensured) == 2
+
+        # Call -- a collection that doesn't exist isn't created by indexing
+        await mou_db_client._ensure_collection_indexed_once("mo", "999.99")
+        assert len(ensured) == 2
+
+        # Call -- a collection created by someone else
+        mock_lcn.side_effect = AsyncMock(return_value=["LIVE_COLLECTION", "678.9"])
+        await mou_db_client._ensure_collection_indexed_once("mo", "678.9")
+        assert ensured[-1] == ("mo", "678.9")
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    async def test_ensure_collection_indexes(_: Any, __: Any) -> None:
+        """Test _ensure_collection_indexes() & the index specs."""
+        # Setup & Mock
+        existing = [
+            {"name": "_id_"},
+            {"name": "Institution_index"},  # made by an earlier version
+            {"name": "labor_deleted"},  # a snapshot's index
+            {"name": "an_operators_index"},
+        ]
+
+        async def _list_indexes() -> Any:
+            for index in existing:
+                yield index
+
+        mock_coll = Mock(
+            update_many=AsyncMock(),
+            create_index=AsyncMock(),
+            drop_index=AsyncMock(),
+            list_indexes=_list_indexes,
+        )
+        mock_mongo = Mock()  # pylint:disable=redefined-outer-name
+        mock_mongo.__getitem__ = Mock(return_value={"LIVE_COLLECTION": mock_coll})
+        mou_db_client = mou_db.MoUDatabaseClient(
+            mock_mongo,
+            utils.MoUDataAdaptor(await tcc.TableConfigCache.create()),
+        )
+
+        # Call
+        await mou_db_client._ensure_collection_indexes(WBS, "LIVE_COLLECTION")
+
+        # Assert
+        mock_coll.update_many.assert_awaited_once_with(
+            {"deleted": {"$exists": False}}, {"$set": {"deleted": False}}
+        )
+        assert mock_coll.create_index.await_count == len(mou_db.INDEX_SPECS["live"])
+        mock_coll.create_index.assert_any_await(
+            [("Institution", 1), ("Labor Cat;", 1), ("deleted", 1)],
+            name="institution_labor_deleted",
+        )
+        mock_coll.create_index.assert_any_await(
+            [("Labor Cat;", 1)],
+            name="labor_not_deleted",
+            partialFilterExpression={"deleted": False},
+        )
+        assert sorted(c.args for c in mock_coll.drop_index.await_args_list) == [
+            ("Institution_index",),
+            ("labor_deleted",),
+        ]
+        assert (WBS, "LIVE_COLLECTION") in mou_db_client._indexed_colls
+
+        # snapshots are never written to, & only get non-partial indexes
+        mock_coll.reset_mock()
+        mock_mongo.__getitem__ = Mock(return_value={"123.45": mock_coll})
+        await mou_db_client._ensure_collection_indexes(WBS, "123.45")
+        mock_coll.update_many.assert_not_awaited()
+        for call in mock_coll.create_index.await_args_list:
+            assert "partialFilterExpression" not in call.kwargs
+        assert sorted(c.args for c in mock_coll.drop_index.await_args_list) == [
+            ("Institution_index",),
+        ]
+
+        # collection types
+        get_type = mou_db.MoUDatabaseClient._get_collection_type
+        assert get_type(WBS, "LIVE_COLLECTION") == "live"
+        assert get_type(WBS, "123.45") == "snapshot"
+        assert get_type(f"{WBS}-supplemental", "LIVE_COLLECTION") == "supplemental"
+        assert get_type(f"{WBS}-supplemental", "snapshots") == "catalog"
+
+        # only record collections get the `deleted` back-fill
+        mock_coll.update_many.reset_mock()
+        mock_mongo.__getitem__ = Mock(return_value={"snapshots": mock_coll})
+        await mou_db_client._ensure_collection_indexes(
+            f"{WBS}-supplemental", "snapshots"
+        )
+        mock_coll.update_many.assert_not_awaited()
+
+    @staticmethod
+    def test_get_table_query() -> None:
+        """Test _get_table_query()."""
+        get_query = mou_db.MoUDatabaseClient._get_table_query
+        assert get_query("", "") == {"deleted": False}
+        assert get_query("KE", "UW") == {
+            "Labor Cat;": "KE",
+            "Institution": "UW",
+            "deleted": False,
+        }
+        # a snapshot's legacy records may not have `deleted`
+        assert get_query("", "UW", "123.45") == {
+            "Institution": "UW",
+            "deleted": {"$ne": True},
+        }
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    async def test_delta_snapshot_view(_: Any, __: Any) -> None:
+        """Test _get_snapshot_layers() & _iter_docs() for delta snapshots."""
+        # Setup & Mock
+        ids = [ObjectId() for _ in range(4)]
+        colls = {  # "3.0" is a delta on "2.0", which is a delta on "1.0" (full)
+            "1.0": [{"_id": i, "v": 1, "deleted": False} for i in ids[:3]],
+            "2.0": [{"_id": ids[0], "v": 2, "deleted": False}],
+            "3.0": [
+                {"_id": ids[1], "deleted": True},  # tombstone
+                {"_id": ids[3], "v": 3, "deleted": False},
+            ],
+        }
+        delta_bases = {"1.0": "", "2.0": "1.0", "3.0": "2.0"}
+
+        def find(name: str, query: Any, *_: Any, **__: Any) -> Any:
+            async def cursor() -> Any:
+                for doc in colls[name]:
+                    if doc["_id"] in query.get("_id", {}).get("$nin", []):
+                        continue
+                    if "deleted" in query and doc["deleted"] != query["deleted"]:
+                        continue
+                    yield doc
+
+            return cursor()
+
+        mock_mongo = MagicMock()
+        mock_mongo.__getitem__.return_value.__getitem__.side_effect = lambda n: Mock(
+            find=lambda *args, **kwargs: find(n, *args, **kwargs)
+        )
+        mou_db_client = mou_db.MoUDatabaseClient(
+            mock_mongo,
+            utils.MoUDataAdaptor(await tcc.TableConfigCache.create()),
+        )
+        mou_db_client._indexed_colls.update((WBS, n) for n in colls)
+        mock_gsd = AsyncMock(side_effect=lambda _, n: {"delta_base": delta_bases[n]})
+
+        # Call & Assert
+        with patch.object(mou_db_client, "_get_supplemental_doc", mock_gsd):
+            assert await mou_db_client._get_snapshot_layers(WBS, "3.0") == [
+                "3.0",
+                "2.0",
+                "1.0",
+            ]
+            assert await mou_db_client._get_snapshot_layers(WBS, "1.0") == ["1.0"]
+            assert mock_gsd.await_count == 4  # then, cached
+            assert await mou_db_client._get_snapshot_layers(WBS, "3.0") == [
+                "3.0",
+                "2.0",
+                "1.0",
+            ]
+            assert mock_gsd.await_count == 4
+
+            query = {"deleted": False}
+            view = [d async for d in mou_db_client._iter_docs(WBS, "3.0", query)]
+            assert sorted((str(d["_id"]), d["v"]) for d in view) == sorted(
+                [(str(ids[0]), 2), (str(ids[2]), 1), (str(ids[3]), 3)]
+            )
+            view = [d async for d in mou_db_client._iter_docs(WBS, "2.0", query)]
+            assert sorted((str(d["_id"]), d["v"]) for d in view) == sorted(
+                [(str(ids[0]), 2), (str(ids[1]), 1), (str(ids[2]), 1)]
+            )
+
+        # a snapshot read before its supplemental doc is written isn't cached
+        mock_gsd = AsyncMock(side_effect=mou_db.DocumentNotFoundError("not yet"))
+        with patch.object(mou_db_client, "_get_supplemental_doc", mock_gsd):
+            assert await mou_db_client._get_snapshot_layers(WBS, "4.0") == ["4.0"]
+        assert (WBS, "4.0") not in mou_db_client._snapshot_layers
+        delta_bases["4.0"] = "3.0"
+        mock_gsd = AsyncMock(side_effect=lambda _, n: {"delta_base": delta_bases[n]})
+        with patch.object(mou_db_client, "_get_supplemental_doc", mock_gsd):
+            assert await mou_db_client._get_snapshot_layers(WBS, "4.0") == [
+                "4.0",
+                "3.0",
+                "2.0",
+                "1.0",
+            ]
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    async def test_copy_live_collection(_: Any, __: Any) -> None:
+        """Test _copy_live_collection()."""
+        # Setup & Mock
+        mock_mongo = MagicMock()
+        mock_coll = mock_mongo.__getitem__.return_value.__getitem__.return_value
+        mock_coll.aggregate.return_value.to_list = AsyncMock(return_value=[])
+        mou_db_client = mou_db.MoUDatabaseClient(
+            mock_mongo,
+            utils.MoUDataAdaptor(await tcc.TableConfigCache.create()),
+        )
+        mou_db_client._indexed_colls.add((WBS, "LIVE_COLLECTION"))
+        mock_eci = AsyncMock()
+
+        # Call
+        with patch.object(mou_db_client, "_ensure_collection_indexes", mock_eci):
+            await mou_db_client._copy_live_collection(WBS, "123.45")
+
+        # Assert
+        mock_coll.aggregate.assert_called_once_with(
+            [{"$match": {"deleted": False}}, {"$out": "123.45"}]
+        )
+        mock_eci.assert_awaited_once_with(WBS, "123.45")
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    @patch(MOU_DB_CLIENT + "._list_collection_names")
+    async def test_list_snapshot_infos(mock_lcn: Any, _: Any, __: Any) -> None:
+        """Test list_snapshot_infos(), from the snapshot catalog."""
+        # Setup & Mock
+        catalog = [  # newest first, like the sorted query
+            {
+                "_id": ObjectId(),
+                "timestamp": ts,
+                "name": f"#{ts}",
+                "creator": "Hank",
+                "admin_only": ts == "2.0",
+                "n_records": 10,
+                "size": 1000,
+            }
+            for ts in ["3.0", "2.0", "1.0"]
+        ]
+
+        def _find(query: Any) -> Any:
+            async def _cursor() -> Any:
+                for doc in catalog:
+                    if doc["admin_only"] == query.get("admin_only", doc["admin_only"]):
+                        yield doc
+
+            return Mock(sort=Mock(return_value=_cursor()))
+
+        mock_mongo = MagicMock()
+        mock_catalog = mock_mongo.__getitem__.return_value.__getitem__.return_value
+        mock_catalog.find.side_effect = _find
+        mock_lcn.side_effect = AsyncMock(return_value=["LIVE_COLLECTION", "1.0"])
+        mou_db_client = mou_db.MoUDatabaseClient(
+            mock_mongo,
+            utils.MoUDataAdaptor(await tcc.TableConfigCache.create()),
+        )
+
+        # Call & Assert
+        infos = await mou_db_client.list_snapshot_infos(WBS, False)
+        mock_mongo.__getitem__.assert_called_with(f"{WBS}-supplemental")
+        mock_catalog.find.assert_called_with({})
+        assert [i["timestamp"] for i in infos] == ["3.0", "2.0", "1.0"]
+        assert infos[0] == {
+            "name": "#3.0",
+            "creator": "Hank",
+            "timestamp": "3.0",
+            "admin_only": False,
+        }
+
+        infos = await mou_db_client.list_snapshot_infos(WBS, True)
+        mock_catalog.find.assert_called_with({"admin_only": False})
+        assert [i["timestamp"] for i in infos] == ["3.0", "1.0"]
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    async def test_live_table_cache(_: Any, __: Any) -> None:
+        """Test get_table()'s live-table cache, invalidated by writes."""
+        # Setup & Mock
+        mock_mongo = MagicMock()
+        mock_coll = mock_mongo.__getitem__.return_value.__getitem__.return_value
+        mock_coll.replace_one = AsyncMock()
+        mou_db_client = mou_db.MoUDatabaseClient(
+            mock_mongo, utils.MoUDataAdaptor(await tcc.TableConfigCache.create())
+        )
+        mock_it = MagicMock()
+
+        async def _iter_table(*args: Any, **kwargs: Any) -> Any:
+            mock_it(*args, **kwargs)
+            yield {columns.ID: "1", "a": mock_it.call_count}
+
+        with patch.object(mou_db_client, "iter_table", _iter_table), patch.object(
+            mou_db_client, "_check_database_state", AsyncMock()
+        ), patch.object(
+            mou_db_client.data_adaptor, "mongofy_record", side_effect=lambda _, r: r
+        ), patch.object(
+            mou_db_client.data_adaptor, "demongofy_record", side_effect=lambda r: r
+        ):
+            # Call & Assert
+            table = await mou_db_client.get_table(WBS)
+            assert table == [{columns.ID: "1", "a": 1}]
+            table[0]["a"] = "changed by the caller"
+            assert await mou_db_client.get_table(WBS) == [{columns.ID: "1", "a": 1}]
+            assert mock_it.call_count == 1
+
+            # different filters & snapshots aren't cached here
+            await mou_db_client.get_table(WBS, labor="KE")
+            await mou_db_client.get_table(WBS, "123.45")
+            await mou_db_client.get_table(WBS, "123.45")
+            assert mock_it.call_count == 4
+
+            # a write invalidates
+            await mou_db_client.upsert_record(WBS, {columns.ID: "1"}, "Hank")
+            assert await mou_db_client.get_table(WBS) == [{columns.ID: "1", "a": 5}]
+            assert await mou_db_client.get_table(WBS) == [{columns.ID: "1", "a": 5}]
+            assert mock_it.call_count == 5
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    async def test_live_fte_groups_cache(_: Any, __: Any) -> None:
+        """Test get_fte_groups()'s live cache, invalidated by writes & age."""
+        # Setup & Mock
+        mou_db_client = mou_db.MoUDatabaseClient(
+            MagicMock(), utils.MoUDataAdaptor(await tcc.TableConfigCache.create())
+        )
+        mock_agg = MagicMock()
+
+        async def _aggregate(pipeline: Any) -> Any:
+            mock_agg(pipeline)
+            yield {
+                "_id": {columns.WBS_L2: "x", columns.FTE: 1.0},
+                "n_records": mock_agg.call_count,
+            }
+
+        async def _iter_layers(wbs_db: str, snap_coll: str, query: Any) -> Any:
+            yield MagicMock(aggregate=_aggregate), query
+
+        with patch.object(mou_db_client, "_iter_layers", _iter_layers), patch.object(
+            mou_db_client, "_check_database_state", AsyncMock()
+        ), patch.object(mou_db_client, "_ensure_collection_indexed_once", AsyncMock()):
+            # Call & Assert
+            groups = await mou_db_client.get_fte_groups(WBS)
+            assert len(groups) == 1 and groups[0][1] == 1
+            assert groups[0][0][columns.WBS_L2] == "x"
+            groups[0][0][columns.WBS_L2] = "changed by the caller"
+            again = await mou_db_client.get_fte_groups(WBS)
+            assert again[0][0][columns.WBS_L2] == "x" and again[0][1] == 1
+            assert mock_agg.call_count == 1
+
+            # different filters & snapshots aren't cached here
+            await mou_db_client.get_fte_groups(WBS, labor="KE")
+            await mou_db_client.get_fte_groups(WBS, "123.45")
+            await mou_db_client.get_fte_groups(WBS, "123.45")
+            assert mock_agg.call_count == 4
+            assert len(mou_db_client._live_fte_groups) == 2
+
+            # a write invalidates
+            mou_db_client._bump_live_version(WBS)
+            assert (await mou_db_client.get_fte_groups(WBS))[0][1] == 5
+            assert (await mou_db_client.get_fte_groups(WBS))[0][1] == 5
+            assert mock_agg.call_count == 5
+
+            # so does age (another process may have written)
+            later = time.time() + mou_db.LIVE_TABLE_CACHE_AGE
+            with patch("time.time", return_value=later):
+                assert (await mou_db_client.get_fte_groups(WBS))[0][1] == 6
+                assert (await mou_db_client.get_fte_groups(WBS))[0][1] == 6
+            assert mock_agg.call_count == 6
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    async def test_institution_values_bad_institution(_: Any, __: Any) -> None:
+        """Test the institution values' methods reject bad institutions.
+
+        Writes need a known institution, reads only a usable name.
+        """
+        # Setup & Mock
+        mock_mongo = MagicMock()
+        mock_coll = mock_mongo.__getitem__.return_value.__getitem__.return_value
+        mock_coll.update_one = AsyncMock()
+        mou_db_client = mou_db.MoUDatabaseClient(
+            mock_mongo, utils.MoUDataAdaptor(await tcc.TableConfigCache.create())
+        )
+        vals: Any = {"phds_authors": 3}
+
+        with patch.object(mou_db_client, "_check_database_state", AsyncMock()):
+            # Call & Assert
+            for bad in ["", "Foo", "UW-Madison.phds_authors", "$UW-Madison"]:
+                with pytest.raises(web.HTTPError) as e:
+                    await mou_db_client.upsert_institution_values(WBS, bad, vals)
+                assert e.value.status_code == 400
+                if bad == "Foo":
+                    continue
+                with pytest.raises(web.HTTPError) as e:
+                    await mou_db_client.get_institution_values(WBS, "", bad)
+                assert e.value.status_code == 400
+            mock_coll.update_one.assert_not_called()
+            mock_coll.find_one.assert_not_called()
+
+            # a snapshot may have an institution that's no longer known
+            with patch.object(
+                mou_db_client,
+                "_get_supplemental_doc",
+                AsyncMock(return_value={"snapshot_institution_values": {"Foo": vals}}),
+            ) as mock_get_doc:
+                assert (await mou_db_client.get_institution_values(WBS, "", "Foo"))[
+                    "phds_authors"
+                ] == 3
+                mock_get_doc.assert_awaited_once()
+
+            await mou_db_client.upsert_institution_values(WBS, "UW-Madison", vals)
+            mock_coll.update_one.assert_awaited_once_with(
+                {"timestamp": "LIVE_COLLECTION"},
+                {"$set": {"snapshot_institution_values.UW-Madison": vals}},
+            )
+
     # NOTE: public methods are tested in integration tests
 
 
+class TestUtils:
+    """Test utils.py helpers."""
+
+    @staticmethod
+    def test_lru_cache() -> None:
+        """Test LRUCache."""
+        cache: utils.LRUCache[str, int] = utils.LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1  # now, "b" is least-recently used
+        cache.put("c", 3)
+        assert "b" not in cache
+        assert len(cache) == 2
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert cache.get("b") is None
+
+        cache.pop("a")
+        cache.pop("zzz")  # no error
+        assert "a" not in cache
+        cache.clear()
+        assert len(cache) == 0
+
+    @staticmethod
+    def test_lru_cache_max_age() -> None:
+        """Test LRUCache with `max_age`."""
+        cache: utils.LRUCache[str, int] = utils.LRUCache(2, max_age=60)
+        with patch("time.time", return_value=1000.0):
+            cache.put("a", 1)
+        with patch("time.time", return_value=1059.0):
+            assert "a" in cache
+            assert cache.get("a") == 1  # being used doesn't renew it
+            cache.put("b", 2)
+        with patch("time.time", return_value=1060.0):
+            assert "a" not in cache
+            assert cache.get("a") is None
+            assert len(cache) == 1
+            assert cache.get("b") == 2
+
+    @staticmethod
+    @pytest.mark.asyncio
+    async def test_record_histories() -> None:
+        """Test RecordHistories."""
+        record = {columns.ID: "1", "a": "new", "b": "same", "c": "added"}
+        new = {columns.ID: "2", "a": "new"}
+        unchanged = {columns.ID: "3", "b": "same"}
+        snaps = [  # newest first
+            ("3.0", [{columns.ID: "1", "a": "mid", "b": "same"}, dict(unchanged)]),
+            ("2.0", [{columns.ID: "1", "a": "old", "b": "same"}, dict(unchanged)]),
+            ("1.0", [{columns.ID: "9"}]),  # before the records existed
+        ]
+
+        async def _aiter(records: List[types.Record]) -> Any:
+            for rec in records:
+                yield rec
+
+        # Call
+        histories = utils.RecordHistories([record, new, unchanged])  # type: ignore
+        for snap_ts, snap_records in snaps:
+            await histories.add_snapshot(snap_ts, _aiter(snap_records))  # type: ignore
+        history, new_history, unchanged_history = histories.get_histories()
+
+        # Assert
+        assert history["record"] == record
+        assert not history["brand_new"]
+        assert not history["never_changed"]
+        assert history["oldest_snapshot"] == "2.0"
+        assert history["field_changes"] == {
+            columns.ID: {},
+            "a": {"today": "new", "3.0": "mid", "2.0": "old", "1.0": "n/a"},
+            "b": {},
+            "c": {},  # only ever NA before
+        }
+
+        # brand new
+        assert new_history["record"] == new
+        assert new_history["brand_new"]
+        assert new_history["never_changed"]
+        assert new_history["field_changes"] == {columns.ID: {}, "a": {}}
+
+        # never changed
+        assert not unchanged_history["brand_new"]
+        assert unchanged_history["never_changed"]
+        assert unchanged_history["oldest_snapshot"] == "2.0"
+
+
+class TestTableHandler:
+    """Test routes.TableHandler."""
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    async def test_get_table_fields(_: Any, __: Any) -> None:
+        """Test _get_table() with `fields`, which sorts before projecting."""
+        # Setup & Mock
+        records = [
+            {
+                columns.ID: str(i),
+                columns.WBS_L2: l2,
+                columns.INSTITUTION: "UW-Madison",
+                columns.SOURCE_OF_FUNDS_US_ONLY: "NSF Base Grants",
+                columns.FTE: 1.0,
+            }
+            for i, l2 in enumerate(["2.3 Computing", "2.1 Program", "2.2 Detector"])
+        ]
+        tc_cache = await tcc.TableConfigCache.create()
+        handler = MagicMock(
+            tc_cache=tc_cache, tc_data_adaptor=utils.TableConfigDataAdaptor(tc_cache)
+        )
+        handler.mou_db_client.get_table = AsyncMock(return_value=records)
+
+        # Call
+        resp = await routes.TableHandler._get_table(  # pylint: disable=W0212
+            handler, WBS, "", "", "", False, [columns.FTE]
+        )
+
+        # Assert
+        projection = handler.mou_db_client.get_table.call_args.kwargs["fields"]
+        assert set(tc_cache.get_sort_precedence()) <= set(projection)
+        assert resp["table"] == [
+            {columns.ID: "1", columns.FTE: 1.0},
+            {columns.ID: "2", columns.FTE: 1.0},
+            {columns.ID: "0", columns.FTE: 1.0},
+        ]
+
+
+class TestRecordsHandler:
+    """Test routes.RecordsHandler."""
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    async def test_post_not_objects(_: Any, __: Any) -> None:
+        """Test post() with some records that aren't objects."""
+        # Setup & Mock
+        good = {columns.ID: "1", columns.INSTITUTION: "UW-Madison", columns.FTE: 1.0}
+        bad = {columns.ID: "2", columns.INSTITUTION: "UW-Madison", columns.FTE: "x"}
+        handler = MagicMock(
+            tc_data_adaptor=utils.TableConfigDataAdaptor(
+                await tcc.TableConfigCache.create()
+            )
+        )
+        handler.get_argument.side_effect = lambda name, **_: {
+            "records": [None, good, "foo", bad, ["bar"]],
+            "editor": "Hank",
+        }[name]
+        handler.mou_db_client.upsert_records = AsyncMock(
+            return_value=[(dict(good), ""), (None, "bad FTE")]
+        )
+
+        # Call
+        await inspect.unwrap(routes.RecordsHandler.post)(handler, WBS)  # no auth
+
+        # Assert
+        upserted = handler.mou_db_client.upsert_records.call_args.args[1]
+        assert [r[columns.ID] for r in upserted] == ["1", "2"]
+        results = handler.write.call_args.args[0]["results"]
+        assert [list(r.keys()) for r in results] == [
+            ["error"],
+            ["record"],
+            ["error"],
+            ["error"],
+            ["error"],
+        ]
+        assert results[1]["record"][columns.ID] == "1"
+        assert results[3]["error"] == "bad FTE"
+
+
+class TestTableHistoryHandler:
+    """Test routes.TableHistoryHandler."""
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    async def test_get(_: Any, __: Any) -> None:
+        """Test get(), which compares records with their on-the-fly fields."""
+        # Setup & Mock
+        non_us = {
+            columns.ID: "1",
+            columns.TIMESTAMP: "2",
+            columns.INSTITUTION: "Sungkyunkwan",
+            columns.SOURCE_OF_FUNDS_US_ONLY: "",
+            columns.FTE: 2.0,
+        }
+        us = {
+            columns.ID: "2",
+            columns.TIMESTAMP: "1",
+            columns.INSTITUTION: "Mercer",
+            columns.SOURCE_OF_FUNDS_US_ONLY: "NSF Base Grants",
+            columns.FTE: 2.0,
+        }
+        snap = [dict(non_us, **{columns.FTE: 1.0}), dict(us, **{columns.FTE: 1.0})]
+
+        async def _iter_table(*_: Any) -> Any:
+            for rec in snap:
+                yield dict(rec)
+
+        handler = MagicMock(
+            tc_data_adaptor=utils.TableConfigDataAdaptor(
+                await tcc.TableConfigCache.create()
+            )
+        )
+        handler.get_argument.return_value = True
+        handler.mou_db_client.list_snapshot_infos = AsyncMock(
+            return_value=[{"timestamp": "1.0"}]
+        )
+        handler.mou_db_client.get_table = AsyncMock(
+            return_value=[dict(non_us), dict(us)]
+        )
+        handler.mou_db_client.iter_table = _iter_table
+
+        # Call
+        await inspect.unwrap(routes.TableHistoryHandler.get)(handler, WBS)  # no auth
+
+        # Assert
+        non_us_history, us_history = handler.write.call_args.args[0]["history"]
+        record = non_us_history["record"]
+        assert record[columns.SOURCE_OF_FUNDS_US_ONLY] == columns.NON_US_IN_KIND
+        assert record[columns.US_NON_US] == tcc.NON_US
+        changes = non_us_history["field_changes"]
+        assert changes[columns.FTE] == {"today": 2.0, "1.0": 1.0}
+        assert not changes[columns.SOURCE_OF_FUNDS_US_ONLY]
+        assert not changes[columns.GRAND_TOTAL]  # mirrors the FTE
+        assert not changes[""]  # blank source's FTE subcolumn
+        # the derived FTE subcolumn
+        changes = us_history["field_changes"]
+        assert changes["NSF Base Grants"] == {"today": 2.0, "1.0": 1.0}
+        assert not changes[columns.GRAND_TOTAL]
+
+
+class TestBaseMoUHandler:
+    """Test routes.BaseMoUHandler's helpers."""
+
+    @staticmethod
+    @pytest.mark.asyncio
+    async def test_write_snapshot_response() -> None:
+        """Test write_snapshot_response(), cached per table-config build."""
+        # Setup & Mock
+        handler = MagicMock(snapshot_responses=utils.LRUCache(4))
+        handler.tc_cache.get_timestamp.return_value = 100
+        handler.check_etag_header.return_value = False
+        handler.mou_db_client.is_snapshot_cataloged = AsyncMock(return_value=True)
+        get_response = AsyncMock(return_value={"table": [{"a": 1}]})
+
+        async def _call() -> str:
+            await routes.BaseMoUHandler.write_snapshot_response(
+                handler, WBS, "123.45", ("table", WBS, "123.45"), get_response
+            )
+            handler.write.assert_called_with(b'{"table": [{"a": 1}]}')
+            return cast(str, handler.set_header.call_args_list[0].args[1])
+
+        # Call & Assert
+        etag = await _call()
+        handler.set_header.reset_mock()
+        assert await _call() == etag
+        get_response.assert_awaited_once()
+
+        # not modified
+        handler.check_etag_header.return_value = True
+        handler.write.reset_mock()
+        await routes.BaseMoUHandler.write_snapshot_response(
+            handler, WBS, "123.45", ("table", WBS, "123.45"), get_response
+        )
+        handler.set_status.assert_called_once_with(304)
+        handler.write.assert_not_called()
+
+        # a refreshed table config
+        handler.check_etag_header.return_value = False
+        handler.tc_cache.get_timestamp.return_value = 200
+        handler.set_header.reset_mock()
+        assert await _call() != etag
+        assert get_response.await_count == 2
+
+    @staticmethod
+    @pytest.mark.asyncio
+    async def test_write_snapshot_response_not_cataloged() -> None:
+        """Test write_snapshot_response() for a nonexistent/in-progress snapshot."""
+        # Setup & Mock
+        handler = MagicMock(snapshot_responses=utils.LRUCache(4))
+        handler.tc_cache.get_timestamp.return_value = 100
+        handler.mou_db_client.is_snapshot_cataloged = AsyncMock(return_value=False)
+        get_response = AsyncMock(return_value={"table": []})
+
+        # Call & Assert
+        for _ in range(2):  # never cached
+            with pytest.raises(web.HTTPError) as e:
+                await routes.BaseMoUHandler.write_snapshot_response(
+                    handler, WBS, "123.45", ("table", WBS, "123.45"), get_response
+                )
+            assert e.value.status_code == 404
+        assert handler.mou_db_client.is_snapshot_cataloged.await_count == 2
+        handler.mou_db_client.is_snapshot_cataloged.assert_awaited_with(
+            WBS, "123.45"
+        )
+        get_response.assert_not_awaited()
+        handler.write.assert_not_called()
+
+        # once it's complete
+        handler.mou_db_client.is_snapshot_cataloged.return_value = True
+        handler.check_etag_header.return_value = False
+        await routes.BaseMoUHandler.write_snapshot_response(
+            handler, WBS, "123.45", ("table", WBS, "123.45"), get_response
+        )
+        handler.write.assert_called_once_with(b'{"table": []}')
+
+
 class TestMongofier:
     """Test mongo_tools.Mongofier."""
 
@@ -204,6 +997,76 @@ class TestMongofier:
         assert mongo_tools.Mongofier.demongofy_document(into) == rehumaned
         assert into != rehumaned  # assert in-place change
 
+    @staticmethod
+    def test_mongofy_document_flat() -> None:
+        """Test mongofy_document() & demongofy_document() w/ flat records."""
+        # Set-Up
+        original_human = {
+            columns.LABOR_CAT: "KE",
+            columns.SOURCE_OF_FUNDS_US_ONLY: None,
+            "Other.Key.": 1.5,
+            columns.ID: "0123456789ab0123456789ab",
+        }
+        mongoed = {
+            "Labor Cat;": "KE",
+            "Source of Funds (U;S; Only)": None,
+            "Other;Key;": 1.5,
+            columns.ID: ObjectId("0123456789ab0123456789ab"),
+        }
+        rehumaned = dict(original_human, **{columns.SOURCE_OF_FUNDS_US_ONLY: ""})
+
+        # Calls & Asserts
+        into = copy.deepcopy(original_human)
+        assert mongo_tools.Mongofier.mongofy_document(into) == mongoed
+        assert into == original_human  # assert no in-place change
+
+        into = copy.deepcopy(mongoed)
+        assert mongo_tools.Mongofier.demongofy_document(into) == rehumaned
+        assert into == mongoed  # assert no in-place change
+
+        # a nested value takes the recursive path, same results
+        assert mongo_tools.Mongofier.mongofy_document(
+            dict(original_human, nest={"a.b": None})
+        ) == dict(mongoed, nest={"a;b": None})
+
+
+class TestConnectionPoolMetrics:
+    """Test mongo_tools.ConnectionPoolMetrics."""
+
+    @staticmethod
+    def test_checkouts() -> None:
+        """Test checking connections out & in, and the wait time."""
+        metrics = mongo_tools.ConnectionPoolMetrics()
+
+        # check out two
+        for _ in range(2):
+            metrics.connection_check_out_started(Mock())
+            metrics.connection_checked_out(Mock())
+        # fail one
+        metrics.connection_check_out_started(Mock())
+        metrics.connection_check_out_failed(Mock())
+
+        summary = metrics.get_summary()
+        assert summary["checked_out"] == 2
+        assert summary["max_checked_out"] == 2
+        assert summary["n_checkouts"] == 2
+        assert summary["n_failed_checkouts"] == 1
+        assert summary["max_wait_secs"] >= summary["avg_wait_secs"] >= 0
+
+        # check in all, and then one more (never negative)
+        for _ in range(3):
+            metrics.connection_checked_in(Mock())
+        summary = metrics.get_summary()
+        assert summary["checked_out"] == 0
+        assert summary["max_checked_out"] == 2
+
+    @staticmethod
+    def test_no_checkouts() -> None:
+        """Test the summary before any events."""
+        summary = mongo_tools.ConnectionPoolMetrics().get_summary()
+        assert summary["n_checkouts"] == 0
+        assert summary["avg_wait_secs"] == 0.0
+
 
 class TestMoUDataAdaptor:
     """Test utils.MoUDataAdaptor."""
@@ -600,6 +1463,59 @@ class TestTableConfigDataAdaptor:
                 for l3_cat in tc_cache.get_l3_categories_by_l2(WBS, l2_cat):
                     assert l3_cat in set(r.get(columns.WBS_L3) for r in totals)
 
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(KRS_INSTS, side_effect=AsyncMock(return_value=institution_list.INSTITUTIONS))
+    @patch(KRS_TOKEN, return_value=Mock())
+    async def test_get_total_rows_from_fte_groups(_: Any, __: Any) -> None:
+        """Test get_total_rows_from_fte_groups() against get_total_rows()."""
+        # Setup & Mock
+        tc_cache = await tcc.TableConfigCache.create()
+        tc_data_adaptor = utils.TableConfigDataAdaptor(tc_cache)
+
+        us_inst = next(i.short_name for i in tc_cache.institutions if i.is_us)
+        non_us_inst = next(i.short_name for i in tc_cache.institutions if not i.is_us)
+        fields = [
+            columns.WBS_L2,
+            columns.WBS_L3,
+            columns.INSTITUTION,
+            columns.SOURCE_OF_FUNDS_US_ONLY,
+            columns.FTE,
+        ]
+        table: types.Table = []
+        for row in copy.deepcopy(data.FTE_ROWS):
+            row[columns.INSTITUTION] = (
+                us_inst if row.pop(columns.US_NON_US) == tcc.US else non_us_inst
+            )
+            table.extend([row, copy.deepcopy(row)])  # duplicates get grouped
+        table.append({f: "" for f in fields})  # blank row
+
+        # group, like the `$group` aggregation
+        counts = Counter(tuple(r[f] for f in fields) for r in table)
+        fte_groups = [(dict(zip(fields, vals)), n) for vals, n in counts.items()]
+        assert len(fte_groups) < len(table)
+
+        for with_us_non_us in [True, False]:
+            for only_totals_w_data in [True, False]:
+                # Call
+                totals = tc_data_adaptor.get_total_rows_from_fte_groups(
+                    WBS,
+                    copy.deepcopy(fte_groups),  # type: ignore[arg-type]
+                    only_totals_w_data=only_totals_w_data,
+                    with_us_non_us=with_us_non_us,
+                )
+
+                # Assert
+                assert totals == tc_data_adaptor.get_total_rows(
+                    WBS,
+                    [
+                        tc_data_adaptor.add_on_the_fly_fields(r)
+                        for r in copy.deepcopy(table)
+                    ],
+                    only_totals_w_data=only_totals_w_data,
+                    with_us_non_us=with_us_non_us,
+                )
+
 
 class TestTableConfig:
     """Test tcc.py."""
@@ -615,12 +1531,13 @@ class TestTableConfig:
         assert tcc.MAX_CACHE_AGE == 5
 
         # Call #1
-        mock_b.return_value = (Mock(), Mock())
+        mock_b.return_value = ({}, [])
         tc_cache = await tcc.TableConfigCache.create()
 
         # assert call to db (from __init__())
         mock_b.assert_called()
         reset_mock(mock_b)
+        built = tc_cache.get_timestamp()
 
         # Call #2 - before cache time limit
         time.sleep(tcc.MAX_CACHE_AGE / 2)
@@ -629,15 +1546,71 @@ class TestTableConfig:
         # assert NO call to source
         mock_b.assert_not_called()
         reset_mock(mock_b)
+        assert tc_cache.get_timestamp() == built
 
         # Call #3 - after cache time limit
         time.sleep(tcc.MAX_CACHE_AGE)
-        mock_b.return_value = (Mock(), Mock())
+        mock_b.return_value = ({}, [])
         await tc_cache.refresh()
 
         # assert call to source
         mock_b.assert_called()
         reset_mock(mock_b)
+        assert tc_cache.get_timestamp() > built
+
+    @staticmethod
+    @pytest.mark.asyncio
+    @patch(TC_CACHE + "._build")
+    @patch("rest_server.data_sources.table_config_cache.MAX_CACHE_AGE", 0)
+    async def test_compiled_lookups(mock_b: Any) -> None:
+        """Test the lookups precomputed from the column configs."""
+        # Setup & Mock
+        mock_b.return_value = (
+            {
+                "Foo": {"width": 5, "sort_value": 1, "numeric": True},
+                "Bar": {"width": 6, "sort_value": 2, "on_the_fly": True},
+                "Baz": {"width": 7, "options": ["a", "b"], "tooltip": "hi"},
+            },
+            [],
+        )
+        tc_cache = await tcc.TableConfigCache.create()
+
+        # Assert
+        assert tc_cache.get_columns() == ("Foo", "Bar", "Baz")
+        assert tc_cache.is_column("Baz") and not tc_cache.is_column("Ham")
+        assert tc_cache.get_numerics() == ("Foo",)
+        assert tc_cache.get_on_the_fly_fields() == frozenset(["Bar"])
+        assert tc_cache.get_widths() == {"Foo": 5, "Bar": 6, "Baz": 7}
+        assert tc_cache.get_tooltips() == {"Baz": "hi"}
+        assert tc_cache.get_simple_dropdown_menus(WBS)["Baz"] == ["a", "b"]
+        assert columns.WBS_L2 in tc_cache.get_simple_dropdown_menus(WBS)
+        assert columns.WBS_L3 in tc_cache.get_conditional_dropdown_menus(WBS)
+
+        # the shared lookups are read-only
+        with pytest.raises(TypeError):
+            tc_cache.get_widths()["Foo"] = 99  # type: ignore[index]
+        with pytest.raises(TypeError):
+            tc_cache.get_tooltips()["Foo"] = "bye"  # type: ignore[index]
+        with pytest.raises(TypeError):
+            tc_cache.get_simple_dropdown_menus(WBS)["Baz"] = []  # type: ignore[index]
+        with pytest.raises(TypeError):
+            del tc_cache.get_conditional_dropdown_menus(WBS)[  # type: ignore[attr-defined]
+                columns.WBS_L3
+            ]
+        assert tc_cache.get_widths() == {"Foo": 5, "Bar": 6, "Baz": 7}
+        assert tc_cache.sort_key({"Foo": 1, "Bar": 2}) == (2, 1)
+        assert tc_cache.sort_key({"Foo": 1}) == ("ZZZZ", 1)
+        assert tc_cache.get_sort_precedence() == ("Bar", "Foo")
+
+        # Call -- refresh w/ new configs
+        mock_b.return_value = ({"Ham": {"width": 1, "sort_value": 1}}, [])
+        await tc_cache.refresh()
+
+        # Assert -- recompiled
+        assert tc_cache.get_columns() == ("Ham",)
+        assert not tc_cache.is_column("Foo")
+        assert not tc_cache.get_on_the_fly_fields()
+        assert tc_cache.sort_key({"Ham": 3, "Foo": 1}) == (3,)
 
     @staticmethod
     @pytest.mark.asyncio
@@ -660,3 +1633,8 @@ class TestTableConfig:
                 assert tc_cache.us_or_non_us(inst.short_name) == "US"
             else:
                 assert tc_cache.us_or_non_us(inst.short_name) == "Non-US"
+            assert tc_cache.get_institution(inst.short_name) == inst
+
+        # unknown institution
+        assert tc_cache.get_institution("Hogwarts") is None
+        assert tc_cache.us_or_non_us("Hogwarts") == ""
@@ -7,11 +7,14 @@
 import inspect
 import itertools
 import sys
+import threading
+import time
 from copy import deepcopy
 from enum import Enum
-from typing import Any, Final, Iterator, List, TypedDict
+from typing import Any, Dict, Final, Iterator, List, TypedDict
 from unittest.mock import patch
 
+import jwt
 import pytest
 import requests
 
@@ -217,13 +220,127 @@ class TestDataSource:
     @staticmethod
     @pytest.fixture
     def mock_rest(mocker: Any) -> Any:
-        """Patch mock_rest."""
-        return mocker.patch("web_app.data_source.connections._rest_connection")
+        """Patch mock_rest -- the checked-out client is `mock_rest.return_value`."""
+        mock = mocker.patch("web_app.data_source.connections._rest_connection")
+        mock.return_value.__enter__.return_value = mock.return_value
+        return mock
+
+    @staticmethod
+    @patch("web_app.data_source.connections._new_rest_connection")
+    def test_rest_connection(mock_nrc: Any) -> None:
+        """Test _rest_connection() reuses clients across (short-lived) threads."""
+        mock_nrc.side_effect = lambda: object()
+
+        with patch.object(connections, "_REST_CLIENTS", connections._RestClientPool(2)):
+            # Call -- one short-lived thread after another, like the web server's
+            seen: List[Any] = []
+
+            def _use_client() -> None:
+                with connections._rest_connection() as rc:
+                    seen.append(rc)
+
+            for _ in range(5):
+                thread = threading.Thread(target=_use_client)
+                thread.start()
+                thread.join()
+            assert len(seen) == 5 and all(rc is seen[0] for rc in seen)
+            assert mock_nrc.call_count == 1
+
+            # Call -- concurrently, a client is only used by one thread at a time
+            with connections._rest_connection() as rc1:
+                with connections._rest_connection() as rc2:
+                    assert rc1 is seen[0] and rc2 is not rc1
+                    assert mock_nrc.call_count == 2
+
+                    # the pool is used up, so the next thread waits
+                    thread = threading.Thread(target=_use_client)
+                    thread.start()
+                    thread.join(timeout=0.1)
+                    assert thread.is_alive()
+                thread.join()
+                assert seen[-1] is rc2
+            assert mock_nrc.call_count == 2
+
+    @staticmethod
+    @patch("web_app.data_source.connections._new_rest_connection")
+    def test_rest_connection_error(mock_nrc: Any) -> None:
+        """Test _rest_connection() when a client can't be made."""
+        mock_nrc.side_effect = [Exception("no token"), "rc"]
+
+        with patch.object(connections, "_REST_CLIENTS", connections._RestClientPool(1)):
+            with pytest.raises(Exception):
+                with connections._rest_connection():
+                    pass
+            with connections._rest_connection() as rc:  # doesn't wait forever
+                assert rc == "rc"
+
+    @staticmethod
+    def test_keep_alive_rest_client(requests_mock: Any) -> None:
+        """Test _KeepAliveRestClient's requests reuse one session."""
+        requests_mock.get("http://localhost:8080/foo", json={"bar": 1})
+        rc = connections._KeepAliveRestClient(
+            "http://localhost:8080", timeout=5, retries=0
+        )
+
+        sessions: List[requests.Session] = []
+        real_request = requests.Session.request
+
+        def _request(session: requests.Session, *args: Any, **kwargs: Any) -> Any:
+            sessions.append(session)
+            return real_request(session, *args, **kwargs)
+
+        # Call
+        with patch.object(
+            requests.Session, "request", autospec=True, side_effect=_request
+        ):
+            for _ in range(3):
+                assert rc.request_seq("GET", "/foo") == {"bar": 1}
+
+        # Assert
+        assert len(sessions) == 3
+        assert all(s is sessions[0] for s in sessions)
+        rc.close()
+
+    @staticmethod
+    @patch("rest_tools.client.client.OpenIDAuth")
+    @patch("rest_tools.client.client.OpenIDRestClient._get_token")
+    def test_keep_alive_openid_rest_client_token(mock_gt: Any, _: Any) -> None:
+        """Test _KeepAliveOpenIDRestClient gets a new token before it expires."""
+        rc = connections._KeepAliveOpenIDRestClient(
+            "http://localhost:8080", "http://token", "client-id", "shh"
+        )
+        tokens: List[Any] = []  # the token at each call to the original
+        mock_gt.side_effect = lambda: tokens.append(rc.access_token)
+
+        def _token(expires_in: float) -> str:
+            return jwt.encode({"exp": time.time() + expires_in}, "secret")
+
+        # Call & Assert
+        rc.access_token = fresh = _token(3600)
+        rc._get_token()
+        assert tokens[-1] == fresh  # kept
+
+        rc.access_token = _token(10)
+        rc._get_token()
+        assert tokens[-1] is None  # dropped, so a new one is gotten
+
+        rc.access_token = _token(-10)
+        rc._get_token()
+        assert tokens[-1] is None
+
+        rc.access_token = "not-a-jwt"
+        rc._get_token()
+        assert tokens[-1] is None
+
+        rc.close()
 
     @staticmethod
     def test_pull_data_table(mock_rest: Any, tconfig: tc.TableConfigParser) -> None:
         """Test pull_data_table()."""
-        response = {"foo": 0, "table": [{"a": "a"}, {"b": 2}, {"c": None}]}
+        response: Dict[str, Any] = {
+            "foo": 0,
+            "table": [{"a": "a"}, {"b": 2}, {"c": None}],
+        }
         bodies = [
             {  # Default values
                 "institution": "",
@@ -265,6 +382,88 @@ class TestDataSource:
             )
             assert ret == response["table"]
 
+        # Only some fields
+        mock_rest.return_value.request_seq.return_value = response
+        ret = src.pull_data_table(WBS, tconfig, raw=True, fields=["FTE"])
+        mock_rest.return_value.request_seq.assert_called_with(
+            "GET", f"/table/data/{WBS}", dict(bodies[0], fields=["FTE"])
+        )
+        assert ret == response["table"]
+
+        # Streamed
+        mock_rest.return_value.request_stream.return_value = iter(response["table"])
+        ret = src.pull_data_table(WBS, tconfig, raw=True, stream=True)
+        mock_rest.return_value.request_stream.assert_called_with(
+            "GET", f"/table/data/{WBS}", dict(bodies[0], stream=True)
+        )
+        assert ret == response["table"]
+
+    @staticmethod
+    def test_mou_request_many(mock_rest: Any) -> None:
+        """Test mou_request_many()."""
+
+        def _request_seq(method: str, url: str, body: Any) -> Any:
+            if body["i"] == 2:
+                raise requests.exceptions.HTTPError("400")
+            return {"i": body["i"], "method": method, "url": url}
+
+        mock_rest.return_value.request_seq.side_effect = _request_seq
+        mock_rest.return_value.request_stream.side_effect = lambda m, u, b: iter(
+            [{"i": b["i"]}, {"line": 2}]
+        )
+        calls = [("GET", f"/foo/{i}", {"i": i}) for i in range(5)]
+        calls.append(("GET", "/foo/5", {"i": 5, "stream": True}))
+
+        # Call
+        ret = connections.mou_request_many(calls)
+
+        # Assert
+        assert len(ret) == 6
+        for i, resp in enumerate(ret):
+            if i == 2:
+                assert isinstance(resp, connections.DataSourceException)
+            elif i == 5:
+                assert resp == [{"i": 5}, {"line": 2}]
+            else:
+                assert resp == {"i": i, "method": "GET", "url": f"/foo/{i}"}
+
+    @staticmethod
+    def test_pull_table_and_institution_values(mock_rest: Any) -> None:
+        """Test pull_table_and_institution_values()."""
+        table = [{"Institution": "UW", "FTE": 1.5}]
+        values = {"UW": {"phds_authors": 3}}
+        mock_rest.return_value.request_stream.side_effect = lambda m, u, b: iter(table)
+        mock_rest.return_value.request_seq.return_value = values
+
+        # Call
+        ret = src.pull_table_and_institution_values(WBS, "123.45", fields=["FTE"])
+
+        # Assert
+        assert ret == (table, values)
+        mock_rest.return_value.request_stream.assert_called_with(
+            "GET",
+            f"/table/data/{WBS}",
+            {"snapshot": "123.45", "stream": True, "fields": ["FTE"]},
+        )
+        mock_rest.return_value.request_seq.assert_called_with(
+            "GET",
+            f"/institution/values/{WBS}/all",
+            {"snapshot_timestamp": "123.45"},
+        )
+
+        # Call -- without the values
+        mock_rest.return_value.request_seq.reset_mock()
+        ret = src.pull_table_and_institution_values(
+            WBS, "", with_institution_values=False
+        )
+        assert ret == (table, {})
+        mock_rest.return_value.request_seq.assert_not_called()
+
+        # Call -- any failure fails
+        mock_rest.return_value.request_seq.side_effect = requests.exceptions.HTTPError
+        with pytest.raises(connections.DataSourceException):
+            src.pull_table_and_institution_values(WBS, "")
+
     @staticmethod
     @patch("web_app.data_source.connections.CurrentUser._get_info")
     def test_push_record(
@@ -323,6 +522,77 @@ class TestDataSource:
             )
             assert ret == unrealistic_hardcoded_resp["record"]
 
+    @staticmethod
+    @patch("web_app.data_source.connections.CurrentUser._get_info")
+    def test_push_records(
+        current_user: Any, mock_rest: Any, tconfig: tc.TableConfigParser
+    ) -> None:
+        """Test push_records()."""
+        current_user.return_value = web_app.data_source.connections.UserInfo(
+            "t.hanks", ["/institutions/IceCube/UW-Madison/_admin"], "foobarbaz"
+        )
+        resp: Dict[str, Any] = {
+            "results": [
+                {"record": {"x": "foo", "y": 22}},
+                {"error": "Invalid Simple-Dropdown Data"},
+            ]
+        }
+        mock_rest.return_value.request_seq.return_value = resp
+
+        # Call
+        ret = src.push_records(WBS, [{"BAR": 23}, {"Alpha": "A9"}], tconfig)
+
+        # Assert
+        blanks = {"Alpha": "", "Dish": "", "F1": "", "Beta": ""}
+        mock_rest.return_value.request_seq.assert_called_with(
+            "POST",
+            f"/records/{WBS}",
+            {"records": [dict(blanks, BAR=23), blanks], "editor": "t.hanks"},
+        )
+        assert ret == [resp["results"][0]["record"], None]
+
+    @staticmethod
+    def test_pull_all_institution_values(mock_rest: Any) -> None:
+        """Test pull_all_institution_values()."""
+        response = {"UW": {"phds_authors": 3, "headcounts_confirmed": True}}
+        mock_rest.return_value.request_seq.return_value = response
+
+        # Call
+        ret = src.pull_all_institution_values(WBS, "123.45")
+
+        # Assert
+        mock_rest.return_value.request_seq.assert_called_with(
+            "GET",
+            f"/institution/values/{WBS}/all",
+            {"snapshot_timestamp": "123.45"},
+        )
+        assert ret == response
+
+    @staticmethod
+    @patch("web_app.data_source.connections.CurrentUser.is_admin")
+    @patch("web_app.data_source.connections.CurrentUser.is_loggedin_with_permissions")
+    def test_pull_table_history(
+        is_loggedin_with_permissions: Any, is_admin: Any, mock_rest: Any
+    ) -> None:
+        """Test pull_table_history()."""
+        is_loggedin_with_permissions.return_value = True
+        is_admin.return_value = True
+        response = {
+            "history": [{"record": {"a": 1}, "field_changes": {}}],
+            "snapshots": [{"timestamp": "123.45", "name": "snap"}],
+        }
+        mock_rest.return_value.request_seq.return_value = response
+
+        # Call
+        history, snapshots = src.pull_table_history(WBS)
+
+        # Assert
+        mock_rest.return_value.request_seq.assert_called_with(
+            "GET", f"/table/history/{WBS}", {"is_admin": True}
+        )
+        assert history == response["history"]
+        assert snapshots == response["snapshots"]
+
     @staticmethod
     @patch("web_app.data_source.connections.CurrentUser._get_info")
     def test_delete_record(current_user: Any, mock_rest: Any) -> None:
@@ -410,8 +680,10 @@ class TestTableConfig:
     @staticmethod
     @pytest.fixture
     def mock_rest(mocker: Any) -> Any:
-        """Patch mock_rest."""
-        return mocker.patch("web_app.data_source.connections._rest_connection")
+        """Patch mock_rest -- the checked-out client is `mock_rest.return_value`."""
+        mock = mocker.patch("web_app.data_source.connections._rest_connection")
+        mock.return_value.__enter__.return_value = mock.return_value
+        return mock
 
     @staticmethod
     def test_consts(tconfig: tc.TableConfigParser) -> None:
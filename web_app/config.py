@@ -13,6 +13,7 @@ from wipac_dev_tools import from_environment  # type: ignore[import]
 
 AUTO_RELOAD_MINS = 30  # how often to auto-reload the page
 MAX_CACHE_MINS = 5  # how often to expire a cache result
+MAX_CONCURRENT_REQUESTS = 8  # REST requests in-flight at once, see `mou_request_many()`
 
 REDIRECT_WBS = "mo"  # which mou to go to by default when ambiguously redirecting
 
@@ -1,9 +1,8 @@
 """Admin-only callbacks for a specified WBS layout."""
 
 import logging
-from collections import OrderedDict as ODict
 from decimal import Decimal
-from typing import Dict, Final, List, Optional, Tuple, TypedDict, cast
+from typing import Any, Dict, Final, List, Optional, Tuple, cast
 
 import dash_bootstrap_components as dbc  # type: ignore[import]
 import dash_core_components as dcc  # type: ignore[import]
@@ -20,11 +19,6 @@ from ..utils import types, utils
 _CHANGES_COL: Final[str] = "Changes"
 
 
-class _SnapshotBundle(TypedDict):
-    table: types.Table
-    info: types.SnapshotInfo
-
-
 def _get_upload_success_modal_body(
     filename: str,
     n_records: int,
@@ -165,8 +159,17 @@ def summarize(
     wbs_l1 = du.get_wbs_l1(s_urlpath)
     tconfig = tc.TableConfigParser(wbs_l1)
 
-    try:
-        data_table = src.pull_data_table(wbs_l1, tconfig)
+    try:  # the table is only summed, so it's streamed (no need to sort)
+        data_table, all_insts_values = src.pull_table_and_institution_values(
+            wbs_l1,
+            s_snap_ts,
+            fields=[
+                tconfig.const.INSTITUTION,
+                tconfig.const.WBS_L2,
+                tconfig.const.FTE,
+            ],
+            with_institution_values=wbs_l1 == "mo",
+        )
     except DataSourceException:
         return [], []
 
@@ -213,18 +216,21 @@ def summarize(
         }
 
         if wbs_l1 == "mo":
-            ret = src.pull_institution_values(wbs_l1, s_snap_ts, short_name)
-            (phds, faculty, sci, grad, cpus, gpus, __, hc_conf, comp_conf) = ret
+            vals = all_insts_values.get(short_name, {})
             row.update(
                 {
-                    "Ph.D. Authors": phds if phds else 0,
-                    "Faculty": faculty if faculty else 0,
-                    "Scientists / Post Docs": sci if sci else 0,
-                    "Ph.D. Students": grad if grad else 0,
-                    "Headcounts Confirmed?": "Yes" if hc_conf else "No",
-                    "CPU": cpus if cpus else 0,
-                    "GPU": gpus if gpus else 0,
-                    "Computing Confirmed?": "Yes" if comp_conf else "No",
+                    "Ph.D. Authors": vals.get("phds_authors") or 0,
+                    "Faculty": vals.get("faculty") or 0,
+                    "Scientists / Post Docs": vals.get("scientists_post_docs") or 0,
+                    "Ph.D. Students": vals.get("grad_students") or 0,
+                    "Headcounts Confirmed?": (
+                        "Yes" if vals.get("headcounts_confirmed") else "No"
+                    ),
+                    "CPU": vals.get("cpus") or 0,
+                    "GPU": vals.get("gpus") or 0,
+                    "Computing Confirmed?": (
+                        "Yes" if vals.get("computing_confirmed") else "No"
+                    ),
                 }
             )
             row["Headcount Total"] = sum(
@@ -250,50 +256,22 @@ def summarize(
 
 
 def _blame_row(
-    record: types.Record,
+    history: Dict[str, Any],
     tconfig: tc.TableConfigParser,
     column_names: List[str],
-    snap_bundles: Dict[str, _SnapshotBundle],
+    snap_infos: Dict[str, types.SnapshotInfo],
 ) -> types.Record:
-    """Get the blame row for a record."""
+    """Get the blame row for a record's history (see `src.pull_table_history()`)."""
+    record: types.Record = history["record"]
     logging.info(f"Blaming {record[tconfig.const.ID]}...")
 
     NA: Final[str] = "n/a"  # pylint: disable=C0103
     MOST_RECENT_VALUE: Final[str] = "today"  # pylint: disable=C0103
 
-    def _find_record_in_snap(table: types.Table) -> Optional[types.Record]:
-        try:
-            return next(
-                r for r in table if r[tconfig.const.ID] == record[tconfig.const.ID]
-            )
-        except StopIteration:
-            return None
-
-    # get each field's history; Schema: { <field>: {<snap_ts>:<field_value>} }
-    field_changes: Dict[str, Dict[str, types.StrNum]] = {}
-    field_changes = ODict({k: ODict({MOST_RECENT_VALUE: record[k]}) for k in record})
-    brand_new, never_changed, oldest_snap_ts = True, True, ""
-    for snap_ts, bundle in snap_bundles.items():
-        if snap_record := _find_record_in_snap(bundle["table"]):
-            brand_new = False
-        for field in record:
-            if field in ["", tconfig.const.GRAND_TOTAL, tconfig.const.US_NON_US]:
-                continue
-            if (not snap_record) or (field not in snap_record):
-                field_changes[field][snap_ts] = NA
-            elif snap_record[field] != record[field]:
-                field_changes[field][snap_ts] = snap_record[field]
-                never_changed = False
-            else:
-                oldest_snap_ts = snap_ts
-
-    # throw out fields that have never changed
-    for field in field_changes:
-        if len(set(field_changes[field].values())) < 2:
-            field_changes[field] = {}
-        # every old value is just NA
-        elif all(v == NA for v in list(field_changes[field].values())[1:]):
-            field_changes[field] = {}
+    # each field's history; Schema: { <field>: {<snap_ts>:<field_value>} }
+    field_changes: Dict[str, Dict[str, types.StrNum]] = history["field_changes"]
+    brand_new, never_changed = history["brand_new"], history["never_changed"]
+    oldest_snap_ts = history["oldest_snapshot"]
 
     # set up markdown
     markdown = ""
@@ -301,7 +279,7 @@ def _blame_row(
         markdown = "***row is brand new***"
     elif never_changed:
         markdown = "**no changes since original snapshot:**\n"
-        markdown += f"- {snap_bundles[oldest_snap_ts]['info']['name']} ({utils.get_human_time(str(oldest_snap_ts), short=True)})"
+        markdown += f"- {snap_infos[oldest_snap_ts]['name']} ({utils.get_human_time(str(oldest_snap_ts), short=True)})"
     else:
         for field, changes in field_changes.items():
             if not changes:
@@ -328,7 +306,7 @@ def _blame_row(
                     )
                 # a historical value
                 else:
-                    markdown += f"    + Snapshot: {snap_bundles[snap_ts]['info']['name']} ({utils.get_human_time(str(snap_ts), short=True)})\n"
+                    markdown += f"    + Snapshot: {snap_infos[snap_ts]['name']} ({utils.get_human_time(str(snap_ts), short=True)})\n"
 
     blame_row = {k: v for k, v in record.items() if k in column_names}
     blame_row[_CHANGES_COL] = markdown
@@ -398,12 +376,9 @@ def blame(
     wbs_l1 = du.get_wbs_l1(s_urlpath)
     tconfig = tc.TableConfigParser(wbs_l1)
 
+    # the server diffs the live table against every snapshot
     try:
-        data_table = src.pull_data_table(wbs_l1, tconfig, raw=True)
-        data_table.sort(
-            key=lambda r: r[tconfig.const.TIMESTAMP],
-            reverse=True,
-        )
+        histories, snap_infos = src.pull_table_history(wbs_l1)
     except DataSourceException:
         return [], [], []
 
@@ -417,20 +392,9 @@ def blame(
     ]
 
     # populate blame table
-    snap_bundles: Dict[str, _SnapshotBundle] = {
-        info["timestamp"]: {
-            "table": src.pull_data_table(
-                wbs_l1,
-                tconfig,
-                snapshot_ts=info["timestamp"],
-                raw=True,
-            ),
-            "info": info,
-        }
-        for info in src.list_snapshots(wbs_l1)
-    }
+    snap_infos_by_ts = {info["timestamp"]: info for info in snap_infos}
     blame_table = [
-        _blame_row(r, tconfig, column_names, snap_bundles) for r in data_table
+        _blame_row(h, tconfig, column_names, snap_infos_by_ts) for h in histories
     ]
 
     return (
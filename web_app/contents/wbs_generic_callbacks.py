@@ -289,11 +289,18 @@ def _push_modified_records(
     ]
 
     last_record = {}
-    for record in modified_records:
+    if len(modified_records) > 1:  # ex: a paste -- push all at once
         try:
-            last_record = src.push_record(wbs_l1, record, tconfig)
+            pushed = src.push_records(wbs_l1, modified_records, tconfig)
+            last_record = next((r for r in reversed(pushed) if r), {})
         except DataSourceException:
             pass
+    else:
+        for record in modified_records:
+            try:
+                last_record = src.push_record(wbs_l1, record, tconfig)
+            except DataSourceException:
+                pass
 
     ids = [c[tconfig.const.ID] for c in modified_records]
     return ids, last_record
@@ -1,41 +1,152 @@
 """Utilities for MoU REST interfaces."""
 
 
+import contextlib
 import copy
+import queue
 import re
 from dataclasses import dataclass
 import json
 import logging
-from typing import Any, Dict, Final, List, Optional, cast
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Final, Iterator, List, Optional, Tuple, cast
 
 import cachetools.func  # type: ignore[import]
 import flask  # type: ignore[import]
+import jwt
 import requests
 
 # local imports
 from rest_tools.client import RestClient, OpenIDRestClient  # type: ignore
 
-from ..config import MAX_CACHE_MINS, get_config_vars, oidc
+from ..config import MAX_CACHE_MINS, MAX_CONCURRENT_REQUESTS, get_config_vars, oidc
 
 
 class DataSourceException(Exception):
     """Exception class for bad data-source requests."""
 
 
-def _rest_connection() -> RestClient:
-    """Return REST Client connection object."""
+_REQUESTS_POOL = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS)
+_TOKEN_REFRESH_MARGIN_SECS: Final[int] = 60
+
+
+class _KeepAliveRestClient(RestClient):
+    """A REST Client whose (sequential) requests all use one session.
+
+    `RestClient.request_seq()` opens a new session for every request, so
+    none of its (keep-alive) connections would be reused.
+    """
+
+    def open(self, sync: bool = False) -> requests.Session:
+        """Open the http session -- the sequential one is only opened once."""
+        if not sync:
+            return super().open(sync)
+        if getattr(self, "_seq_session", None) is None:
+            self._seq_session = super().open(sync=True)
+        self.session = self._seq_session
+        return self.session
+
+    def close(self) -> None:
+        """Close the http sessions."""
+        super().close()
+        if getattr(self, "_seq_session", None) is not None:
+            self._seq_session.close()
+
+
+class _KeepAliveOpenIDRestClient(_KeepAliveRestClient, OpenIDRestClient):
+    """An OpenID REST Client whose (sequential) requests all use one session.
+
+    Since the client is long-lived, its token is refreshed shortly before
+    it expires (`OpenIDRestClient` only does so after it has expired).
+    """
+
+    def _get_token(self) -> None:
+        if self.access_token:
+            try:
+                exp = jwt.decode(
+                    self.access_token,  # type: ignore[arg-type]  # bytes is fine too
+                    options={"verify_signature": False},
+                )["exp"]
+            except (jwt.PyJWTError, KeyError):
+                exp = 0  # unknown, so get a new one
+            if exp < time.time() + _TOKEN_REFRESH_MARGIN_SECS:
+                logging.debug("REST token expires soon, getting a new one")
+                self.access_token = None
+        super()._get_token()
+
+
+class _RestClientPool:
+    """A process-wide pool of REST Clients, each used by one thread at a time.
+
+    The web server makes a new thread per request, so the clients can't
+    be per-thread. Otherwise, each would be rebuilt every callback (along
+    with its session and token). At most `maxsize` clients are made. When
+    they're all in use, the next thread waits for one.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._idle: "queue.LifoQueue[RestClient]" = queue.LifoQueue()  # warmest 1st
+        self._n_made = 0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def client(self) -> Iterator[RestClient]:
+        """Check out a client for the duration of the context."""
+        rc = self._checkout()
+        try:
+            yield rc
+        finally:
+            self._idle.put(rc)
+
+    def _checkout(self) -> RestClient:
+        with self._lock:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                make_new = self._n_made < self.maxsize
+                if make_new:
+                    self._n_made += 1
+        if not make_new:
+            return self._idle.get()  # wait for one to be returned
+
+        try:
+            return _new_rest_connection()  # not under the lock, it gets a token
+        except Exception:
+            with self._lock:
+                self._n_made -= 1
+            raise
+
+
+_REST_CLIENTS = _RestClientPool(MAX_CONCURRENT_REQUESTS)
+
+
+def _rest_connection() -> "contextlib.AbstractContextManager[RestClient]":
+    """Check out a REST Client connection object, from the process-wide pool.
+
+    The clients are reused, so their sessions' (keep-alive) connections
+    and their tokens are too -- a token is refreshed shortly before it
+    expires.
+    """
+    return _REST_CLIENTS.client()
+
+
+def _new_rest_connection() -> RestClient:
+    """Return a new REST Client connection object."""
     config_vars = get_config_vars()
 
     if config_vars["CI_TEST_ENV"]:
         logging.warning("CI TEST ENV - no auth to REST API")
-        rc = RestClient(
+        rc = _KeepAliveRestClient(
             config_vars["REST_SERVER_URL"],
             timeout=5,
             retries=0
         )
     else:
         oidc_client = json.load(open(config_vars["OIDC_CLIENT_SECRETS"])).get("web", {})
-        rc = OpenIDRestClient(
+        rc = _KeepAliveOpenIDRestClient(
             config_vars["REST_SERVER_URL"],
             token_url=oidc_client.get("issuer"),
             client_id=oidc_client.get("client_id"),
@@ -66,7 +177,8 @@ def mou_request(method: str, url: str, body: Any = None) -> Dict[str, Any]:
     logging.info(f"REQUEST :: {method} @ {url}, body: {log_body}")
 
     try:
-        response: Dict[str, Any] = _rest_connection().request_seq(method, url, body)
+        with _rest_connection() as rc:
+            response: Dict[str, Any] = rc.request_seq(method, url, body)
     except requests.exceptions.HTTPError as e:
         logging.exception(f"EXCEPTED: {e}")
         raise DataSourceException(str(e))
@@ -87,6 +199,52 @@ def mou_request(method: str, url: str, body: Any = None) -> Dict[str, Any]:
     return response
 
 
+def mou_request_stream(method: str, url: str, body: Any = None) -> Iterator[Any]:
+    """Make a request to the MoU REST server, yielding each line of the response.
+
+    For newline-delimited JSON responses (like a streamed table).
+    """
+    log_body = _get_log_body(method, url, body)
+    logging.info(f"REQUEST (streamed) :: {method} @ {url}, body: {log_body}")
+
+    try:
+        with _rest_connection() as rc:
+            yield from rc.request_stream(method, url, body)
+    except requests.exceptions.HTTPError as e:
+        logging.exception(f"EXCEPTED: {e}")
+        raise DataSourceException(str(e))
+
+
+def mou_request_many(calls: List[Tuple[str, str, Any]]) -> List[Any]:
+    """Make independent requests to the MoU REST server, concurrently.
+
+    Each call is a `(method, url, body)` tuple. The requests are made by a
+    shared thread pool, so at most `MAX_CONCURRENT_REQUESTS` are in-flight.
+    A request's error is captured as its result (`DataSourceException`)
+    instead of raised, so the caller can decide.
+
+    A call whose body has `"stream": True` is streamed, so its response is
+    a list of its lines (`mou_request_stream()`).
+
+    Returns:
+        List[Any] -- the responses/errors, in the same order as `calls`
+    """
+
+    def _request(call: Tuple[str, str, Any]) -> Any:
+        method, url, body = call
+        try:
+            if isinstance(body, dict) and body.get("stream"):
+                return list(mou_request_stream(method, url, body))
+            return mou_request(method, url, body)
+        except DataSourceException as e:
+            return e
+        except Exception as e:  # pylint: disable=broad-except
+            logging.exception(f"EXCEPTED: {e}")
+            return DataSourceException(str(e))
+
+    return list(_REQUESTS_POOL.map(_request, calls))
+
+
 #
 # Static Institution Info Functions
 #
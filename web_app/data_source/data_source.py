@@ -1,12 +1,18 @@
 """REST interface for reading and writing MoU data."""
 
 
+import logging
 from typing import Any, Dict, Final, List, Optional, Tuple, TypedDict, Union, cast
 
 from ..data_source.connections import CurrentUser
 from ..utils import types, utils
 from . import table_config as tc
-from .connections import mou_request
+from .connections import (
+    DataSourceException,
+    mou_request,
+    mou_request_many,
+    mou_request_stream,
+)
 
 # constants
 _OC_SUFFIX: Final[str] = "_original"
@@ -236,6 +242,8 @@ def pull_data_table(  # pylint: disable=R0913
     snapshot_ts: types.DashVal = "",
     restore_id: str = "",
     raw: bool = False,
+    fields: Optional[List[str]] = None,
+    stream: bool = False,
 ) -> types.Table:
     """Get table, optionally filtered by institution and/or labor.
 
@@ -249,6 +257,8 @@ def pull_data_table(  # pylint: disable=R0913
         snapshot_ts {str} -- name of snapshot (default: {""})
         restore_id {str} -- id of a record to be restored (default: {""})
         raw -- {bool} -- True if data isn't for datatable display (default: {False})
+        fields -- {list} -- only get these fields, plus the id (default: {None})
+        stream -- {bool} -- stream the (unsorted) table record-by-record (default: {False})
 
     Returns:
         types.Table -- the returned table
@@ -264,22 +274,107 @@ def pull_data_table(  # pylint: disable=R0913
         table: types.Table
 
     # request
-    body = {
+    body: Dict[str, Any] = {
         "institution": institution,
         "labor": labor,
         "total_rows": with_totals,
         "snapshot": snapshot_ts,
         "restore_id": restore_id,
     }
+    if fields:
+        body["fields"] = fields
 
-    response = cast(
-        _RespTableData,
-        mou_request("GET", f"/table/data/{wbs_l1}", body=body),
-    )
+    if stream:
+        body["stream"] = True
+        table = list(mou_request_stream("GET", f"/table/data/{wbs_l1}", body=body))
+    else:
+        response = cast(
+            _RespTableData,
+            mou_request("GET", f"/table/data/{wbs_l1}", body=body),
+        )
+        table = response["table"]
     # get & convert
     if raw:
-        return response["table"]
-    return _convert_table_rest_to_dash(response["table"], tconfig)
+        return table
+    return _convert_table_rest_to_dash(table, tconfig)
+
+
+def pull_table_and_institution_values(
+    wbs_l1: str,
+    snapshot_ts: types.DashVal,
+    fields: Optional[List[str]] = None,
+    with_institution_values: bool = True,
+) -> Tuple[types.Table, Dict[str, Dict[str, Any]]]:
+    """Get the whole (raw) table and every institution's values, concurrently.
+
+    Like `pull_data_table(raw=True, stream=True)` and
+    `pull_all_institution_values()`, but the requests are made
+    concurrently (see `mou_request_many()`).
+
+    Keyword Arguments:
+        fields -- {list} -- only get these fields, plus the id (default: {None})
+        with_institution_values -- {bool} -- also get the values (default: {True})
+
+    Returns:
+        types.Table -- the (unsorted) table
+        Dict[str, Dict[str, Any]] -- every institution's values ({} if not gotten)
+
+    Raises:
+        DataSourceException -- if any of the requests failed
+    """
+    _validate(wbs_l1, str, falsy_okay=False)
+    snapshot_ts = _validate(snapshot_ts, types.DashVal_types, out=str)
+    _validate(with_institution_values, bool)
+
+    # request
+    body: Dict[str, Any] = {"snapshot": snapshot_ts, "stream": True}
+    if fields:
+        body["fields"] = fields
+    calls = [("GET", f"/table/data/{wbs_l1}", body)]
+    if with_institution_values:
+        calls.append(
+            (
+                "GET",
+                f"/institution/values/{wbs_l1}/all",
+                {"snapshot_timestamp": snapshot_ts},
+            )
+        )
+
+    responses = mou_request_many(calls)
+    for resp in responses:
+        if isinstance(resp, DataSourceException):
+            raise resp
+
+    # get
+    if with_institution_values:
+        return responses[0], responses[1]
+    return responses[0], {}
+
+
+def pull_table_history(
+    wbs_l1: str,
+) -> Tuple[List[Dict[str, Any]], List[types.SnapshotInfo]]:
+    """Get the live table's history over the snapshots (computed by the server).
+
+    Returns:
+        List[Dict[str, Any]] -- each live record's history (most recently edited first)
+        List[types.SnapshotInfo] -- the snapshots compared, newest first
+    """
+    _validate(wbs_l1, str, falsy_okay=False)
+
+    class _RespTableHistory(TypedDict):
+        history: List[Dict[str, Any]]
+        snapshots: List[types.SnapshotInfo]
+
+    body = {
+        "is_admin": CurrentUser.is_loggedin_with_permissions()
+        and CurrentUser.is_admin()
+    }
+    response = cast(
+        _RespTableHistory, mou_request("GET", f"/table/history/{wbs_l1}", body)
+    )
+
+    return response["history"], response["snapshots"]
 
 
 def push_record(  # pylint: disable=R0913
@@ -328,6 +423,45 @@ def push_record(  # pylint: disable=R0913
     return _convert_record_rest_to_dash(response["record"], tconfig, novel=novel)
 
 
+def push_records(
+    wbs_l1: str,
+    records: types.Table,
+    tconfig: tc.TableConfigParser,
+) -> List[Optional[types.Record]]:
+    """Push many new/changed records to source, in one request.
+
+    Returns:
+        List[Optional[types.Record]] -- each returned record, in order
+                                        (`None` for a record that failed)
+    """
+    _validate(wbs_l1, str, falsy_okay=False)
+    _validate(records, list)
+    _validate(tconfig, tc.TableConfigParser)
+
+    class _RespRecordResult(TypedDict, total=False):
+        record: types.Record
+        error: str
+
+    class _RespRecords(TypedDict):
+        results: List[_RespRecordResult]
+
+    # request
+    body: Dict[str, Any] = {
+        "records": [_convert_record_dash_to_rest(r, tconfig) for r in records],
+        "editor": CurrentUser.get_username(),
+    }
+    response = cast(_RespRecords, mou_request("POST", f"/records/{wbs_l1}", body=body))
+    # get & convert
+    pushed: List[Optional[types.Record]] = []
+    for result in response["results"]:
+        if "record" in result:
+            pushed.append(_convert_record_rest_to_dash(result["record"], tconfig))
+        else:
+            logging.error(f"Failed to push a record: {result.get('error')}")
+            pushed.append(None)
+    return pushed
+
+
 def delete_record(wbs_l1: str, record_id: str) -> None:
     """Delete the record, return True if successful."""
     _validate(wbs_l1, str, falsy_okay=False)
@@ -458,6 +592,21 @@ def pull_institution_values(
     )
 
 
+def pull_all_institution_values(
+    wbs_l1: str, snapshot_ts: types.DashVal
+) -> Dict[str, Dict[str, Any]]:
+    """Get every institution's values, keyed by institution (short name).
+
+    Institutions without values are absent.
+    """
+    _validate(wbs_l1, str, falsy_okay=False)
+    snapshot_ts = _validate(snapshot_ts, types.DashVal_types, out=str)
+
+    body = {"snapshot_timestamp": snapshot_ts}
+    response = mou_request("GET", f"/institution/values/{wbs_l1}/all", body=body)
+    return cast(Dict[str, Dict[str, Any]], response)
+
+
 def push_institution_values(  # pylint: disable=R0913
     wbs_l1: str,
     institution: types.DashVal,